@@ -9,11 +9,13 @@ from __future__ import annotations
 
 import asyncio
 import atexit
+import inspect
 import logging
 import sys
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
+import torch
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -36,7 +38,7 @@ class LocalhostOnlyMiddleware(BaseHTTPMiddleware):
     itself will still reject non-local requests.
     """
 
-    _LOOPBACK = frozenset({"127.0.0.1", "::1", "localhost"})
+    _LOOPBACK: frozenset[str] = frozenset({"127.0.0.1", "::1", "localhost"})
 
     async def dispatch(self, request: Request, call_next):
         client_host = request.client.host if request.client else None
@@ -153,9 +155,6 @@ async def lifespan(app: FastAPI):
     _unsafe_counter: dict[str, int] = {"count": 0}
 
     try:
-        import inspect
-        import torch
-
         sig = inspect.signature(torch.load)
         if "weights_only" in sig.parameters:
             supports_weights_only = True
@@ -169,8 +168,8 @@ async def lifespan(app: FastAPI):
 
             torch.load = _monitor_torch_load
     except Exception:
-        # If anything goes wrong with inspection (old torch, import
-        # error, etc.), fall back to no monitoring.
+        # If anything goes wrong with inspection (old torch, missing
+        # ``load`` attribute, etc.), fall back to no monitoring.
         supports_weights_only = False
 
     try:
@@ -180,12 +179,7 @@ async def lifespan(app: FastAPI):
     finally:
         # Restore original torch.load if we wrapped it.
         if supports_weights_only and _orig_torch_load is not None:
-            try:
-                import torch as _torch
-
-                _torch.load = _orig_torch_load
-            except Exception:
-                pass
+            torch.load = _orig_torch_load
 
     logger.info("HoVerNet engine loaded (device=%s)", engine.device)
 
@@ -1,6 +1,6 @@
 """Models subpackage."""
 
-from app.models.database import Base, engine, async_session_factory, get_db, init_models
+from app.models.database import Base, engine, async_session_factory, get_db, get_session_factory, init_models
 from app.models.nucleus import AnalysisBox, Nucleus, Slide
 
 __all__ = [
@@ -8,6 +8,7 @@ __all__ = [
     "engine",
     "async_session_factory",
     "get_db",
+    "get_session_factory",
     "init_models",
     "AnalysisBox",
     "Nucleus",
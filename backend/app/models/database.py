@@ -33,6 +33,7 @@ from __future__ import annotations
 
 import logging
 
+from fastapi import Depends
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
@@ -66,7 +67,14 @@ class Base(DeclarativeBase):
     pass
 
 
-async def get_db() -> AsyncSession:  # type: ignore[misc]
+def get_session_factory() -> async_sessionmaker[AsyncSession]:
+    """FastAPI dependency — the session factory used by ``get_db``."""
+    return async_session_factory
+
+
+async def get_db(
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> AsyncSession:  # type: ignore[misc]
     """
     FastAPI dependency — yields an async DB session.
 
@@ -78,8 +86,12 @@ async def get_db() -> AsyncSession:  # type: ignore[misc]
     On error the session is rolled back, and the exception is
     re-raised so FastAPI's exception handlers can produce the correct
     HTTP response.
+
+    The factory is itself injected so it can be swapped through
+    ``dependency_overrides`` (or passed directly) without patching the
+    module global.
     """
-    session = async_session_factory()
+    session = session_factory()
     try:
         yield session
     except SQLAlchemyError as exc:
@@ -11,6 +11,7 @@ be rendered, selected, and deleted.
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
 import logging
 import uuid
@@ -72,6 +73,21 @@ def _compute_box_stats(nuclei_list, bounds, mpp):
     }
 
 
+_ANALYSIS_LABEL_RE = re.compile(r"^Analysis\s+(\d+)$")
+
+
+@functools.lru_cache(maxsize=512)
+def _analysis_label_number(label: str) -> int | None:
+    """Return ``n`` for a label of the form 'Analysis {n}', else ``None``."""
+    m = _ANALYSIS_LABEL_RE.match(label.strip())
+    if not m:
+        return None
+    try:
+        return int(m.group(1))
+    except ValueError:  # pragma: no cover – regex \d+ guarantees valid int
+        return None
+
+
 async def _assign_analysis_label(db: AsyncSession, slide_id: uuid.UUID) -> str:
     """Return the next available label 'Analysis N' for the given slide.
 
@@ -83,16 +99,12 @@ async def _assign_analysis_label(db: AsyncSession, slide_id: uuid.UUID) -> str:
     labels = result.scalars().all()
 
     used = set()
-    pattern = re.compile(r"^Analysis\s+(\d+)$")
     for lbl in labels:
         if not isinstance(lbl, str):
             continue
-        m = pattern.match(lbl.strip())
-        if m:
-            try:
-                used.add(int(m.group(1)))
-            except ValueError:  # pragma: no cover – regex \d+ guarantees valid int
-                continue
+        num = _analysis_label_number(lbl)
+        if num is not None:
+            used.add(num)
 
     n = 1
     while n in used:
@@ -7,12 +7,14 @@ Upload, list, and serve DZI tiles for WSIs via OpenSeadragon.
 from __future__ import annotations
 
 import asyncio
+import io
 import shutil
 import uuid
 from pathlib import Path, PurePosixPath
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile
 from fastapi.responses import Response
+from PIL import Image
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -35,6 +37,11 @@ _ALLOWED_EXTENSIONS: frozenset[str] = frozenset(
 _MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024 * 1024
 
 
+def _resolve_dest(storage: Path, name: str) -> Path:
+    """Canonical on-disk path for *name* inside *storage*."""
+    return (storage / name).resolve()
+
+
 # ── Upload a WSI ──────────────────────────────────────────────────
 @router.post("/upload", response_model=SlideOut, status_code=201)
 async def upload_slide(
@@ -83,7 +90,7 @@ async def upload_slide(
     storage = Path(settings.slides_dir).resolve()
     storage.mkdir(parents=True, exist_ok=True)
     unique_name = f"{uuid.uuid4()}{extension}"
-    dest = (storage / unique_name).resolve()
+    dest = _resolve_dest(storage, unique_name)
 
     # ── 4. Canonicalize and verify path is inside storage root ─
     # Defense against any edge-case where the resolved path escapes
@@ -283,8 +290,6 @@ async def get_thumbnail(
         loop = asyncio.get_event_loop()
         
         def generate_thumbnail():
-            import io
-            from PIL import Image
             from app.services.slide import _tls_open
             
             # Use thread-local OpenSlide handle (thread-safe).
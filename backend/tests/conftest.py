@@ -2,18 +2,33 @@
 Shared fixtures for the Slidekick test suite.
 
 This conftest provides:
+- Stub ``tiatoolbox`` modules installed at configure time
 - Async session mocking
-- Test client (httpx.AsyncClient) with a mock DB override
+- Session-wide test clients with a mock DB override: an
+  ``httpx.AsyncClient`` for boxes/inference, a ``TestClient`` for roi/slides
 - Reusable sample data factories
 """
 from __future__ import annotations
 
+import pickle
+import sys
+import types
 import uuid
 from datetime import datetime, timezone
-from unittest.mock import AsyncMock, MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import MagicMock
 
 import pytest
 import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from starlette.testclient import TestClient
+
+from app.models.database import get_db
+from app.routers.boxes import router as boxes_router
+from app.routers.inference import router as inference_router
+from app.routers.roi import router as roi_router
+from app.routers.slides import router as slides_router
 
 # ---------------------------------------------------------------------------
 # Force asyncio mode for all async tests (avoids per-file markers)
@@ -21,6 +36,149 @@ import pytest_asyncio
 pytest_plugins = []
 
 
+# ---------------------------------------------------------------------------
+# TIAToolbox stub — HoVerNetEngine.load_model imports it lazily
+# ---------------------------------------------------------------------------
+def pytest_configure(config):
+    """Install stub ``tiatoolbox`` modules so no test ever imports the real one.
+
+    ``tiatoolbox.models.architecture.get_pretrained_model`` is a shared
+    ``MagicMock``; tests configure its ``return_value`` / ``side_effect``.
+    """
+    pkg = sys.modules.setdefault("tiatoolbox", types.ModuleType("tiatoolbox"))
+    models = sys.modules.setdefault("tiatoolbox.models", types.ModuleType("tiatoolbox.models"))
+    arch = sys.modules.setdefault(
+        "tiatoolbox.models.architecture", types.ModuleType("tiatoolbox.models.architecture"),
+    )
+    if not hasattr(arch, "get_pretrained_model"):
+        arch.get_pretrained_model = MagicMock()
+    pkg.models = models
+    models.architecture = arch
+
+
+# ---------------------------------------------------------------------------
+# Fake async DB session
+# ---------------------------------------------------------------------------
+class FakeDB:
+    """Plain-coroutine stand-in for ``AsyncSession`` in router tests.
+
+    ``get`` / ``execute`` return whatever ``get_return`` / ``execute_return``
+    hold; ``add`` / ``delete`` / ``flush`` / ``refresh`` / ``commit`` just
+    record the call.
+    Cheaper than ``AsyncMock`` because nothing is generated on access.
+    """
+
+    def __init__(self) -> None:
+        self.get_return = None
+        self.execute_return = None
+        self.added: list = []
+        self.deleted: list = []
+        self.flushes = 0
+        self.refreshed: list = []
+        self.commits = 0
+
+    async def get(self, *args, **kwargs):
+        return self.get_return
+
+    async def execute(self, *args, **kwargs):
+        return self.execute_return
+
+    def add(self, obj) -> None:
+        self.added.append(obj)
+
+    async def delete(self, obj) -> None:
+        self.deleted.append(obj)
+
+    async def flush(self) -> None:
+        self.flushes += 1
+
+    async def refresh(self, obj) -> None:
+        self.refreshed.append(obj)
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+
+# ---------------------------------------------------------------------------
+# Shared router app + client (boxes and inference)
+# ---------------------------------------------------------------------------
+def _router_app(*routers) -> FastAPI:
+    """A bare app with *routers* under ``/api`` and no OpenAPI/docs routes."""
+    app = FastAPI(
+        openapi_url=None,
+        docs_url=None,
+        redoc_url=None,
+        swagger_ui_oauth2_redirect_url=None,
+    )
+    for router in routers:
+        app.include_router(router, prefix="/api")
+    return app
+
+
+@pytest.fixture(scope="session")
+def combined_app() -> FastAPI:
+    """The boxes and inference routers under ``/api``, built once per session.
+
+    ``get_db`` yields ``app.state.current_mock_db``; test modules bind their
+    per-test ``FakeDB`` there.
+    """
+    app = _router_app(boxes_router, inference_router)
+
+    async def override_get_db():
+        yield app.state.current_mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+@pytest.fixture(scope="session")
+def combined_transport(combined_app) -> ASGITransport:
+    return ASGITransport(app=combined_app)
+
+
+@pytest_asyncio.fixture(scope="session")
+async def combined_client(combined_transport):
+    async with AsyncClient(transport=combined_transport, base_url="http://testserver") as client:
+        yield client
+
+
+# ---------------------------------------------------------------------------
+# Shared router app + sync client (roi and slides)
+# ---------------------------------------------------------------------------
+@pytest.fixture(scope="session")
+def app() -> FastAPI:
+    """The roi and slides routers under ``/api``, built once per session."""
+    return _router_app(roi_router, slides_router)
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    """A synchronous client; its portal loop lives for the whole session."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture()
+def mock_db():
+    return FakeDB()
+
+
+@pytest.fixture()
+def _override_db(app, mock_db):
+    """Point ``get_db`` at the test module's ``mock_db`` for one test.
+
+    Modules using the shared ``client`` opt in with
+    ``pytestmark = pytest.mark.usefixtures("_override_db")``.
+    """
+
+    async def override_get_db():
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield
+    app.dependency_overrides.pop(get_db)
+
+
 # ---------------------------------------------------------------------------
 # Sample data factories
 # ---------------------------------------------------------------------------
@@ -28,61 +186,63 @@ SAMPLE_SLIDE_ID = uuid.UUID("aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee")
 SAMPLE_BOX_ID = uuid.UUID("11111111-2222-3333-4444-555555555555")
 
 
-def make_slide_row(
-    *,
-    id: uuid.UUID | None = None,
-    filename: str = "test.svs",
-    filepath: str = "/slides/test.svs",
-    mpp: float = 0.25,
-    width_px: int = 10000,
-    height_px: int = 8000,
-) -> MagicMock:
-    """Return a mock that behaves like a Slide ORM object."""
-    slide = MagicMock()
-    slide.id = id or SAMPLE_SLIDE_ID
-    slide.filename = filename
-    slide.filepath = filepath
-    slide.mpp = mpp
-    slide.width_px = width_px
-    slide.height_px = height_px
-    slide.created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
-    slide.updated_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
-    slide.metadata_ = {}
-    return slide
-
-
-def make_box_row(
-    *,
-    id: uuid.UUID | None = None,
-    slide_id: uuid.UUID | None = None,
-    label: str = "Analysis 1",
-    x_min: float = 0.0,
-    y_min: float = 0.0,
-    x_max: float = 1000.0,
-    y_max: float = 1000.0,
-    total_nuclei: int = 100,
-    area_mm2: float = 0.0625,
-    density_per_mm2: float = 1600.0,
-    neoplastic_ratio: float = 0.3,
-    cell_type_counts: dict | None = None,
-) -> MagicMock:
-    """Return a mock that behaves like an AnalysisBox ORM object."""
-    box = MagicMock()
-    box.id = id or SAMPLE_BOX_ID
-    box.slide_id = slide_id or SAMPLE_SLIDE_ID
-    box.label = label
-    box.x_min = x_min
-    box.y_min = y_min
-    box.x_max = x_max
-    box.y_max = y_max
-    box.total_nuclei = total_nuclei
-    box.area_mm2 = area_mm2
-    box.density_per_mm2 = density_per_mm2
-    box.neoplastic_ratio = neoplastic_ratio
-    box.cell_type_counts = cell_type_counts or {
+# Canonical rows are plain namespaces (picklable, unlike MagicMock) frozen
+# to bytes once at import; every factory call unpickles a fresh copy that
+# tests may mutate freely.
+_SLIDE_BLOB = pickle.dumps(SimpleNamespace(
+    id=SAMPLE_SLIDE_ID,
+    filename="test.svs",
+    filepath="/slides/test.svs",
+    mpp=0.25,
+    width_px=10000,
+    height_px=8000,
+    created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+    updated_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+    metadata_={},
+))
+
+_BOX_BLOB = pickle.dumps(SimpleNamespace(
+    id=SAMPLE_BOX_ID,
+    slide_id=SAMPLE_SLIDE_ID,
+    label="Analysis 1",
+    x_min=0.0,
+    y_min=0.0,
+    x_max=1000.0,
+    y_max=1000.0,
+    total_nuclei=100,
+    area_mm2=0.0625,
+    density_per_mm2=1600.0,
+    neoplastic_ratio=0.3,
+    cell_type_counts={
         "1": {"count": 30, "name": "Neoplastic"},
         "2": {"count": 70, "name": "Inflammatory"},
-    }
-    box.created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
-    box.geom = "POLYGON((0 0, 1000 0, 1000 1000, 0 1000, 0 0))"
-    return box
+    },
+    created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+    geom="POLYGON((0 0, 1000 0, 1000 1000, 0 1000, 0 0))",
+))
+
+
+def _apply_overrides(row: SimpleNamespace, overrides: dict) -> SimpleNamespace:
+    """Set *overrides* on *row*, rejecting names the sample row does not have."""
+    if unknown := overrides.keys() - vars(row).keys():
+        raise TypeError(f"unexpected field(s): {sorted(unknown)}")
+    vars(row).update(overrides)
+    return row
+
+
+def make_slide_row(**overrides) -> SimpleNamespace:
+    """Return an object that behaves like a Slide ORM object.
+
+    Keyword arguments override individual attributes of the sample slide
+    and are applied as given (``None`` / ``{}`` included).
+    """
+    return _apply_overrides(pickle.loads(_SLIDE_BLOB), overrides)
+
+
+def make_box_row(**overrides) -> SimpleNamespace:
+    """Return an object that behaves like an AnalysisBox ORM object.
+
+    Keyword arguments override individual attributes of the sample box
+    and are applied as given (``None`` / ``{}`` included).
+    """
+    return _apply_overrides(pickle.loads(_BOX_BLOB), overrides)
@@ -0,0 +1 @@
+"""Fixture-free pure-function tests."""
@@ -0,0 +1,60 @@
+"""
+Tests for app.services.bulk_insert._contour_to_wkt — contour → WKT POLYGON.
+
+Pure-function tests with no fixtures, kept apart so they can run without
+pytest's per-test plugins::
+
+    pytest tests/fast -p no:logging -p no:cacheprovider
+"""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.bulk_insert import _contour_to_wkt
+
+
+# ═══════════════════════════════════════════════════════════════════
+# _contour_to_wkt
+# ═══════════════════════════════════════════════════════════════════
+# Input contours; _contour_to_wkt copies before closing the ring, so
+# these are shared across tests.
+_TRIANGLE = [[0, 0], [10, 0], [10, 10]]
+_SQUARE = [[0, 0], [10, 0], [10, 10], [0, 10]]
+_CLOSED_SQUARE = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+_COLLINEAR = [[0, 0], [5, 0], [10, 0]]
+_SQUARE_ARRAY = np.array([[0, 0], [5, 0], [5, 5], [0, 5]], dtype=np.float64)
+_SQUARE_ARRAY.setflags(write=False)
+
+
+class TestContourToWkt:
+    def test_none_contour(self):
+        assert _contour_to_wkt(None) is None
+
+    def test_too_few_points(self):
+        assert _contour_to_wkt([[0, 0], [1, 1]]) is None
+
+    def test_1d_array(self):
+        """1-D array should fail (ndim != 2)."""
+        assert _contour_to_wkt([1, 2, 3]) is None
+
+    @pytest.mark.parametrize("contour", [
+        pytest.param(_TRIANGLE, id="triangle"),
+        pytest.param(_SQUARE, id="square"),
+        pytest.param(_CLOSED_SQUARE, id="already-closed-ring"),
+        pytest.param(_SQUARE_ARRAY, id="ndarray"),
+    ])
+    def test_valid_polygon(self, contour):
+        wkt = _contour_to_wkt(contour)
+        assert wkt is not None
+        assert "POLYGON" in wkt
+
+    def test_invalid_polygon_collinear(self):
+        """Three collinear points form a degenerate polygon.
+        Shapely may still consider it valid (as a zero-area polygon),
+        so just verify we get a non-None result (it's still a valid WKT)
+        or None depending on Shapely version."""
+        result = _contour_to_wkt(_COLLINEAR)
+        # Shapely 2.x may return None for degenerate polygons
+        # or may return a valid WKT — both are acceptable.
+        assert result is None or "POLYGON" in result
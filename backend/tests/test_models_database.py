@@ -8,6 +8,16 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.models import database
+from app.models.database import (
+    Base,
+    async_session_factory,
+    engine,
+    get_db,
+    get_session_factory,
+    init_models,
+)
+
 
 # ═══════════════════════════════════════════════════════════════════
 # get_db session lifecycle
@@ -16,54 +26,35 @@ class TestGetDb:
     """Tests for the get_db async generator dependency."""
 
     @pytest.mark.asyncio
-    async def test_yields_session_and_closes(self):
+    @pytest.mark.parametrize("exc_to_raise, expect_rollback", [
+        pytest.param(None, False, id="normal-completion"),
+        pytest.param(SQLAlchemyError("test db error"), True, id="sqlalchemy-error"),
+        pytest.param(RuntimeError("unexpected"), True, id="generic-exception"),
+    ])
+    async def test_get_db_lifecycle(self, exc_to_raise, expect_rollback):
         mock_session = AsyncMock()
 
-        with patch("app.models.database.async_session_factory", return_value=mock_session):
-            from app.models.database import get_db
-
-            gen = get_db()
-            session = await gen.__anext__()
-            assert session is mock_session
+        gen = get_db(session_factory=lambda: mock_session)
+        session = await gen.__anext__()
+        assert session is mock_session
 
+        if exc_to_raise is None:
             # Simulate normal completion
             with pytest.raises(StopAsyncIteration):
                 await gen.__anext__()
+        else:
+            # Throw the error into the generator; it must be re-raised
+            with pytest.raises(type(exc_to_raise)):
+                await gen.athrow(exc_to_raise)
 
-            mock_session.close.assert_awaited_once()
-
-    @pytest.mark.asyncio
-    async def test_rollback_on_sqlalchemy_error(self):
-        mock_session = AsyncMock()
-
-        with patch("app.models.database.async_session_factory", return_value=mock_session):
-            from app.models.database import get_db
-
-            gen = get_db()
-            session = await gen.__anext__()
-
-            # Throw a SQLAlchemy error into the generator
-            with pytest.raises(SQLAlchemyError):
-                await gen.athrow(SQLAlchemyError("test db error"))
-
+        if expect_rollback:
             mock_session.rollback.assert_awaited_once()
-            mock_session.close.assert_awaited_once()
-
-    @pytest.mark.asyncio
-    async def test_rollback_on_generic_exception(self):
-        mock_session = AsyncMock()
+        else:
+            mock_session.rollback.assert_not_awaited()
+        mock_session.close.assert_awaited_once()
 
-        with patch("app.models.database.async_session_factory", return_value=mock_session):
-            from app.models.database import get_db
-
-            gen = get_db()
-            session = await gen.__anext__()
-
-            with pytest.raises(RuntimeError):
-                await gen.athrow(RuntimeError("unexpected"))
-
-            mock_session.rollback.assert_awaited_once()
-            mock_session.close.assert_awaited_once()
+    def test_default_session_factory(self):
+        assert get_session_factory() is async_session_factory
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -71,15 +62,12 @@ class TestGetDb:
 # ═══════════════════════════════════════════════════════════════════
 class TestModuleLevelObjects:
     def test_engine_exists(self):
-        from app.models.database import engine
         assert engine is not None
 
     def test_session_factory_exists(self):
-        from app.models.database import async_session_factory
         assert async_session_factory is not None
 
     def test_base_class(self):
-        from app.models.database import Base
         assert hasattr(Base, "metadata")
 
 
@@ -99,13 +87,11 @@ class TestInitModels:
         mock_ctx.__aenter__ = AsyncMock(return_value=mock_conn)
         mock_ctx.__aexit__ = AsyncMock(return_value=False)
 
-        with patch("app.models.database.engine") as mock_engine:
+        with patch.object(database, "engine") as mock_engine:
             mock_engine.begin.return_value = mock_ctx
-            from app.models.database import init_models
             await init_models()
 
         mock_conn.run_sync.assert_awaited_once()
         # The argument passed to run_sync should be Base.metadata.create_all
-        from app.models.database import Base
         call_args = mock_conn.run_sync.call_args
         assert call_args[0][0] == Base.metadata.create_all
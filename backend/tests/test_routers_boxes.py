@@ -6,43 +6,30 @@ from __future__ import annotations
 import math
 import uuid
 from datetime import datetime, timezone
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import MagicMock, patch
 
 import pytest
-from fastapi import FastAPI
-from httpx import ASGITransport, AsyncClient
+from fastapi import HTTPException
 
-from app.routers.boxes import router
-from tests.conftest import SAMPLE_BOX_ID, SAMPLE_SLIDE_ID, make_box_row, make_slide_row
+from app.routers.boxes import delete_box, get_box_detail, list_boxes
+from tests.conftest import (
+    SAMPLE_BOX_ID,
+    SAMPLE_SLIDE_ID,
+    make_box_row,
+    make_slide_row,
+)
 
 
-def _create_test_app() -> FastAPI:
-    app = FastAPI()
-    app.include_router(router, prefix="/api")
-    return app
+@pytest.fixture(autouse=True)
+def _bind_mock_db(combined_app, mock_db):
+    combined_app.state.current_mock_db = mock_db
+    yield
+    del combined_app.state.current_mock_db
 
 
-@pytest.fixture()
-def app():
-    return _create_test_app()
-
-
-@pytest.fixture()
-def mock_db():
-    return AsyncMock()
-
-
-@pytest.fixture()
-def client(app, mock_db):
-    from app.models.database import get_db
-
-    async def override_get_db():
-        yield mock_db
-
-    app.dependency_overrides[get_db] = override_get_db
-
-    transport = ASGITransport(app=app)
-    return AsyncClient(transport=transport, base_url="http://testserver")
+@pytest.fixture(scope="session")
+def client(combined_client):
+    return combined_client
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -50,33 +37,33 @@ def client(app, mock_db):
 # ═══════════════════════════════════════════════════════════════════
 class TestListBoxes:
     @pytest.mark.asyncio
-    async def test_list_boxes_slide_not_found(self, client, mock_db):
-        mock_db.get.return_value = None
-        resp = await client.get(f"/api/boxes/{SAMPLE_SLIDE_ID}")
-        assert resp.status_code == 404
+    async def test_list_boxes_slide_not_found(self, mock_db):
+        mock_db.get_return = None
+        with pytest.raises(HTTPException) as exc_info:
+            await list_boxes(slide_id=SAMPLE_SLIDE_ID, db=mock_db)
+        assert exc_info.value.status_code == 404
 
     @pytest.mark.asyncio
-    async def test_list_boxes_empty(self, client, mock_db):
-        mock_db.get.return_value = make_slide_row()
+    async def test_list_boxes_empty(self, mock_db):
+        mock_db.get_return = make_slide_row()
 
         mock_result = MagicMock()
         mock_result.scalars.return_value.all.return_value = []
-        mock_db.execute.return_value = mock_result
+        mock_db.execute_return = mock_result
 
-        resp = await client.get(f"/api/boxes/{SAMPLE_SLIDE_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert data["boxes"] == []
-        assert data["slide_id"] == str(SAMPLE_SLIDE_ID)
+        result = await list_boxes(slide_id=SAMPLE_SLIDE_ID, db=mock_db)
+        assert result.boxes == []
+        assert result.slide_id == SAMPLE_SLIDE_ID
 
     @pytest.mark.asyncio
     async def test_list_boxes_with_data(self, client, mock_db):
-        mock_db.get.return_value = make_slide_row()
+        """End-to-end through the router, including JSON serialization."""
+        mock_db.get_return = make_slide_row()
 
         box = make_box_row()
         mock_result = MagicMock()
         mock_result.scalars.return_value.all.return_value = [box]
-        mock_db.execute.return_value = mock_result
+        mock_db.execute_return = mock_result
 
         resp = await client.get(f"/api/boxes/{SAMPLE_SLIDE_ID}")
         assert resp.status_code == 200
@@ -87,163 +74,100 @@ class TestListBoxes:
 # ═══════════════════════════════════════════════════════════════════
 # GET /boxes/detail/{box_id}
 # ═══════════════════════════════════════════════════════════════════
+# (cell_type_counts, total_nuclei, expected subset of the JSON response)
+_BOX_DETAIL_CASES = [
+    (
+        {
+            "0": {"count": 5, "name": "Background"},
+            "1": {"count": 30, "name": "Neoplastic"},
+            "2": {"count": 20, "name": "Inflammatory"},
+            "3": {"count": 15, "name": "Connective"},
+            "4": {"count": 10, "name": "Dead"},
+            "5": {"count": 20, "name": "Non-Neoplastic Epithelial"},
+        },
+        100,
+        {
+            "total_nuclei": 100,
+            "shannon_h": pytest.approx(
+                -sum(p * math.log(p) for p in (0.05, 0.3, 0.2, 0.15, 0.1, 0.2))
+            ),
+            "viability": 0.9,  # (100 - 10) / 100
+            "inflammatory_index": pytest.approx(20 / 95),
+            "neoplastic_ratio": 0.3,
+        },
+    ),
+    ({}, 0, {"shannon_h": 0.0, "viability": 0.0}),
+    # num>0, denom=0 → undefined ratio
+    (
+        {
+            "1": {"count": 30, "name": "Neoplastic"},
+            "2": {"count": 20, "name": "Inflammatory"},
+        },
+        50,
+        {"ne_epithelial_ratio": None},
+    ),
+    ({"2": {"count": 50, "name": "Inflammatory"}}, 50, {"immune_tumour_ratio": None}),
+    # num=0 and denom=0 → safe_ratio returns 0.0
+    (
+        {"3": {"count": 50, "name": "Connective"}},
+        50,
+        {"immune_tumour_ratio": 0.0, "ne_epithelial_ratio": 0.0},
+    ),
+    # cell_type_counts values may be plain ints rather than dicts
+    ({"1": 30, "2": 20}, 50, {"immune_tumour_ratio": pytest.approx(20 / 30)}),
+    (
+        {
+            "0": {"count": 10, "name": "Background"},
+            "1": {"count": 25, "name": "Neoplastic"},
+            "2": {"count": 20, "name": "Inflammatory"},
+            "3": {"count": 25, "name": "Connective"},
+            "4": {"count": 15, "name": "Dead"},
+            "5": {"count": 25, "name": "Non-Neoplastic Epithelial"},
+        },
+        120,
+        {"ne_epithelial_ratio": 1.0, "immune_tumour_ratio": pytest.approx(0.8)},
+    ),
+    (
+        {
+            "1": {"count": 0, "name": "Neoplastic"},  # zero-count triggers branch 115→114
+            "4": {"count": 50, "name": "Dead"},
+        },
+        50,
+        {"viability": 0.0, "neoplastic_ratio": 0.3},
+    ),
+]
+
+
 class TestGetBoxDetail:
     @pytest.mark.asyncio
     async def test_box_not_found(self, client, mock_db):
-        mock_db.get.return_value = None
+        """End-to-end through the router."""
+        mock_db.get_return = None
         resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
         assert resp.status_code == 404
 
     @pytest.mark.asyncio
-    async def test_box_detail_with_breakdown(self, client, mock_db):
-        box = make_box_row(
-            total_nuclei=100,
-            cell_type_counts={
-                "0": {"count": 5, "name": "Background"},
-                "1": {"count": 30, "name": "Neoplastic"},
-                "2": {"count": 20, "name": "Inflammatory"},
-                "3": {"count": 15, "name": "Connective"},
-                "4": {"count": 10, "name": "Dead"},
-                "5": {"count": 20, "name": "Non-Neoplastic Epithelial"},
-            },
-        )
-        mock_db.get.return_value = box
-
-        resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-
-        assert len(data["cell_type_breakdown"]) == 6
-        assert data["total_nuclei"] == 100
-        assert data["shannon_h"] > 0
-        assert data["viability"] == 0.9  # (100 - 10) / 100
-        assert data["inflammatory_index"] is not None
-        assert data["neoplastic_ratio"] == 0.3
-
-    @pytest.mark.asyncio
-    async def test_box_detail_zero_nuclei(self, client, mock_db):
-        box = make_box_row(total_nuclei=0, cell_type_counts={})
-        mock_db.get.return_value = box
-
-        resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert data["shannon_h"] == 0.0
-        assert data["viability"] == 0.0
-
-    @pytest.mark.asyncio
-    async def test_box_detail_no_epithelial(self, client, mock_db):
-        """When epithelial count = 0 and neoplastic > 0, ne_epithelial_ratio should be None."""
-        box = make_box_row(
-            total_nuclei=50,
-            cell_type_counts={
-                "1": {"count": 30, "name": "Neoplastic"},
-                "2": {"count": 20, "name": "Inflammatory"},
-            },
-        )
-        mock_db.get.return_value = box
-
-        resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert data["ne_epithelial_ratio"] is None  # num>0, denom=0
-
-    @pytest.mark.asyncio
-    async def test_box_detail_no_neoplastic(self, client, mock_db):
-        """When neoplastic=0 and inflammatory>0, immune_tumour_ratio should be None."""
-        box = make_box_row(
-            total_nuclei=50,
-            cell_type_counts={
-                "2": {"count": 50, "name": "Inflammatory"},
-            },
-        )
-        mock_db.get.return_value = box
-
-        resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert data["immune_tumour_ratio"] is None
-
-    @pytest.mark.asyncio
-    async def test_box_detail_both_zero_ratio(self, client, mock_db):
-        """When both num=0 and denom=0, safe_ratio returns 0.0."""
-        box = make_box_row(
-            total_nuclei=50,
-            cell_type_counts={
-                "3": {"count": 50, "name": "Connective"},
-            },
-        )
-        mock_db.get.return_value = box
-
-        resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-        # immune_tumour_ratio: num=0(inflammatory), denom=0(neoplastic) → 0.0
-        assert data["immune_tumour_ratio"] == 0.0
-        # ne_epithelial_ratio: num=0(neoplastic), denom=0(epithelial) → 0.0
-        assert data["ne_epithelial_ratio"] == 0.0
-
-    @pytest.mark.asyncio
-    async def test_box_detail_cell_type_counts_plain_int(self, client, mock_db):
-        """Handle cell_type_counts where value is a plain int, not dict."""
-        box = make_box_row(
-            total_nuclei=50,
-            cell_type_counts={
-                "1": 30,
-                "2": 20,
-            },
-        )
-        mock_db.get.return_value = box
-
-        resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-        # Should handle both dict and int formats
-        assert len(data["cell_type_breakdown"]) == 2
-
-    @pytest.mark.asyncio
-    async def test_box_detail_all_cell_types_present(self, client, mock_db):
-        """When all 6 cell types are present, count_of finds each one."""
-        box = make_box_row(
-            total_nuclei=120,
-            cell_type_counts={
-                "0": {"count": 10, "name": "Background"},
-                "1": {"count": 25, "name": "Neoplastic"},
-                "2": {"count": 20, "name": "Inflammatory"},
-                "3": {"count": 25, "name": "Connective"},
-                "4": {"count": 15, "name": "Dead"},
-                "5": {"count": 25, "name": "Non-Neoplastic Epithelial"},
-            },
-        )
-        mock_db.get.return_value = box
-
-        resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert len(data["cell_type_breakdown"]) == 6
-        # ne_epithelial_ratio = 25/25 = 1.0
-        assert data["ne_epithelial_ratio"] == 1.0
-        # immune_tumour_ratio = 20/25 = 0.8
-        assert abs(data["immune_tumour_ratio"] - 0.8) < 1e-9
-
-    @pytest.mark.asyncio
-    async def test_box_detail_only_dead_cells(self, client, mock_db):
-        """When only dead cells present, viability = 0."""
-        box = make_box_row(
-            total_nuclei=50,
-            cell_type_counts={
-                "1": {"count": 0, "name": "Neoplastic"},  # zero-count triggers branch 115→114
-                "4": {"count": 50, "name": "Dead"},
-            },
-        )
-        mock_db.get.return_value = box
-
-        resp = await client.get(f"/api/boxes/detail/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert data["viability"] == 0.0
-        # count_of(1) for neoplastic → 0 (loop finds it but count is 0)
-        assert data["neoplastic_ratio"] is not None
+    @pytest.mark.parametrize("counts,total,expected", _BOX_DETAIL_CASES, ids=[
+        "with_breakdown",
+        "zero_nuclei",
+        "no_epithelial",
+        "no_neoplastic",
+        "both_zero_ratio",
+        "plain_int",
+        "all_cell_types_present",
+        "only_dead_cells",
+    ])
+    async def test_box_detail(self, mock_db, counts, total, expected):
+        box = make_box_row(total_nuclei=total, cell_type_counts=counts)
+        mock_db.get_return = box
+
+        data = (await get_box_detail(box_id=SAMPLE_BOX_ID, db=mock_db)).model_dump()
+        # Every stored cell type (dict or plain-int value) gets a breakdown row.
+        assert {ct["cell_type"] for ct in data["cell_type_breakdown"]} == {
+            int(k) for k in box.cell_type_counts
+        }
+        for key, value in expected.items():
+            assert data[key] == value, key
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -251,17 +175,19 @@ class TestGetBoxDetail:
 # ═══════════════════════════════════════════════════════════════════
 class TestDeleteBox:
     @pytest.mark.asyncio
-    async def test_delete_not_found(self, client, mock_db):
-        mock_db.get.return_value = None
-        resp = await client.delete(f"/api/boxes/{SAMPLE_BOX_ID}")
-        assert resp.status_code == 404
+    async def test_delete_not_found(self, mock_db):
+        mock_db.get_return = None
+        with pytest.raises(HTTPException) as exc_info:
+            await delete_box(box_id=SAMPLE_BOX_ID, db=mock_db)
+        assert exc_info.value.status_code == 404
 
     @pytest.mark.asyncio
     async def test_delete_success(self, client, mock_db):
+        """End-to-end through the router."""
         box = make_box_row()
-        mock_db.get.return_value = box
+        mock_db.get_return = box
 
         resp = await client.delete(f"/api/boxes/{SAMPLE_BOX_ID}")
         assert resp.status_code == 204
-        mock_db.delete.assert_called_once_with(box)
-        mock_db.commit.assert_awaited_once()
+        assert mock_db.deleted == [box]
+        assert mock_db.commits == 1
@@ -4,36 +4,35 @@ _assign_analysis_label, and SSE endpoint.
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import re
+import threading
 import uuid
 from datetime import datetime, timezone
+from typing import NamedTuple
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import numpy as np
 import pytest
-from fastapi import FastAPI
-from httpx import ASGITransport, AsyncClient
-
-from app.routers.inference import (
-    _assign_analysis_label,
-    _compute_box_stats,
-    router,
-)
+
+from app.routers.inference import _assign_analysis_label, _compute_box_stats
+from app.services.inference import DetectedNucleus, InferenceResult
 from app.spatial.transform import ViewportBounds
-from tests.conftest import SAMPLE_SLIDE_ID, make_slide_row
+from tests.conftest import SAMPLE_SLIDE_ID, FakeDB, make_slide_row
 
 
 # ═══════════════════════════════════════════════════════════════════
 # _compute_box_stats
 # ═══════════════════════════════════════════════════════════════════
-class TestComputeBoxStats:
-    def _make_nuc(self, cell_type=1, cell_type_name="Neoplastic"):
-        nuc = MagicMock()
-        nuc.cell_type = cell_type
-        nuc.cell_type_name = cell_type_name
-        return nuc
+class _Nuc(NamedTuple):
+    """The only two attributes ``_compute_box_stats`` reads from a nucleus."""
+
+    cell_type: int = 1
+    cell_type_name: str = "Neoplastic"
 
+
+class TestComputeBoxStats:
     def test_empty_nuclei(self):
         bounds = ViewportBounds(x_min=0, y_min=0, x_max=1000, y_max=1000)
         stats = _compute_box_stats([], bounds, mpp=0.25)
@@ -43,9 +42,9 @@ class TestComputeBoxStats:
 
     def test_with_nuclei(self):
         nuclei = [
-            self._make_nuc(1, "Neoplastic"),
-            self._make_nuc(1, "Neoplastic"),
-            self._make_nuc(2, "Inflammatory"),
+            _Nuc(1, "Neoplastic"),
+            _Nuc(1, "Neoplastic"),
+            _Nuc(2, "Inflammatory"),
         ]
         bounds = ViewportBounds(x_min=0, y_min=0, x_max=4000, y_max=4000)
         stats = _compute_box_stats(nuclei, bounds, mpp=0.25)
@@ -59,7 +58,7 @@ class TestComputeBoxStats:
         assert "2" in stats["cell_type_counts"]
 
     def test_zero_area(self):
-        nuclei = [self._make_nuc()]
+        nuclei = [_Nuc()]
         bounds = ViewportBounds(x_min=0, y_min=0, x_max=0, y_max=0)
         stats = _compute_box_stats(nuclei, bounds, mpp=0.25)
         assert stats["density_per_mm2"] == 0.0
@@ -68,230 +67,199 @@ class TestComputeBoxStats:
 # ═══════════════════════════════════════════════════════════════════
 # _assign_analysis_label
 # ═══════════════════════════════════════════════════════════════════
-class TestAssignAnalysisLabel:
-    @pytest.mark.asyncio
-    async def test_first_label(self):
-        mock_db = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = []
-        mock_db.execute.return_value = mock_result
+def _db_with_labels(labels: list) -> FakeDB:
+    """A FakeDB whose ``execute().scalars().all()`` returns *labels*."""
+    db = FakeDB()
+    db.execute_return = MagicMock()
+    db.execute_return.scalars.return_value.all.return_value = labels
+    return db
 
-        label = await _assign_analysis_label(mock_db, SAMPLE_SLIDE_ID)
-        assert label == "Analysis 1"
-
-    @pytest.mark.asyncio
-    async def test_next_available(self):
-        mock_db = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [
-            "Analysis 1", "Analysis 2", "Analysis 3",
-        ]
-        mock_db.execute.return_value = mock_result
-
-        label = await _assign_analysis_label(mock_db, SAMPLE_SLIDE_ID)
-        assert label == "Analysis 4"
 
+class TestAssignAnalysisLabel:
     @pytest.mark.asyncio
-    async def test_gap_filling(self):
-        """Should fill gaps: [1,3] → 2."""
-        mock_db = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [
-            "Analysis 1", "Analysis 3",
-        ]
-        mock_db.execute.return_value = mock_result
+    @pytest.mark.parametrize("labels,expected", [
+        ([], "Analysis 1"),
+        (["Analysis 1", "Analysis 2", "Analysis 3"], "Analysis 4"),
+        # Gaps are filled: [1, 3] → 2
+        (["Analysis 1", "Analysis 3"], "Analysis 2"),
+        # Labels not matching 'Analysis N' are ignored
+        (["Custom Label", "My Analysis", "Analysis 1"], "Analysis 2"),
+        # Non-string labels are silently skipped
+        ([None, 123, "Analysis 1"], "Analysis 2"),
+        # Surrounding whitespace still matches
+        (["  Analysis 1  ", "Analysis 2"], "Analysis 3"),
+        # A very large number still parses
+        (["Analysis 999999999999999999999999"], "Analysis 1"),
+    ], ids=["first", "next", "gap", "nonmatch", "nonstring", "whitespace", "bignum"])
+    async def test_assign_label(self, labels, expected):
+        label = await _assign_analysis_label(_db_with_labels(labels), SAMPLE_SLIDE_ID)
+        assert label == expected
 
-        label = await _assign_analysis_label(mock_db, SAMPLE_SLIDE_ID)
-        assert label == "Analysis 2"
 
-    @pytest.mark.asyncio
-    async def test_non_matching_labels_ignored(self):
-        """Labels not matching 'Analysis N' should be ignored."""
-        mock_db = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [
-            "Custom Label", "My Analysis", "Analysis 1",
-        ]
-        mock_db.execute.return_value = mock_result
-
-        label = await _assign_analysis_label(mock_db, SAMPLE_SLIDE_ID)
-        assert label == "Analysis 2"
+# ═══════════════════════════════════════════════════════════════════
+# POST /inference/viewport-stream (SSE endpoint)
+# ═══════════════════════════════════════════════════════════════════
 
-    @pytest.mark.asyncio
-    async def test_non_string_labels_ignored(self):
-        """Non-string labels should be silently skipped."""
-        mock_db = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [
-            None, 123, "Analysis 1",
-        ]
-        mock_db.execute.return_value = mock_result
+@pytest.fixture()
+def inf_mock_db():
+    return FakeDB()
 
-        label = await _assign_analysis_label(mock_db, SAMPLE_SLIDE_ID)
-        assert label == "Analysis 2"
 
-    @pytest.mark.asyncio
-    async def test_whitespace_in_label(self):
-        """Labels with extra whitespace should still match."""
-        mock_db = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [
-            "  Analysis 1  ", "Analysis 2",
-        ]
-        mock_db.execute.return_value = mock_result
+@pytest.fixture(autouse=True)
+def _bind_inf_mock_db(combined_app, inf_mock_db):
+    combined_app.state.current_mock_db = inf_mock_db
+    yield
+    del combined_app.state.current_mock_db
 
-        label = await _assign_analysis_label(mock_db, SAMPLE_SLIDE_ID)
-        assert label == "Analysis 3"
 
-    @pytest.mark.asyncio
-    async def test_very_large_number(self):
-        """Analysis label with a very large number should still parse."""
-        mock_db = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [
-            "Analysis 999999999999999999999999",
-        ]
-        mock_db.execute.return_value = mock_result
+@pytest.fixture(scope="session")
+def inf_client(combined_client):
+    return combined_client
 
-        label = await _assign_analysis_label(mock_db, SAMPLE_SLIDE_ID)
-        assert label == "Analysis 1"
 
+@pytest.fixture(scope="module")
+def fake_tile():
+    """Read-only RGB tile shared by every test that mocks ``read_region_l0``."""
+    tile = np.zeros((1000, 1000, 3), dtype=np.uint8)
+    tile.setflags(write=False)
+    return tile
 
-# ═══════════════════════════════════════════════════════════════════
-# POST /inference/viewport-stream (SSE endpoint)
-# ═══════════════════════════════════════════════════════════════════
 
-def _create_test_app() -> FastAPI:
-    app = FastAPI()
-    app.include_router(router, prefix="/api")
-    return app
+@pytest.fixture(scope="module")
+def fake_nuc():
+    # float64, C-contiguous — the same layout InferenceEngine produces.
+    contour = np.ascontiguousarray(
+        [[490.0, 390.0], [510.0, 390.0], [510.0, 410.0], [490.0, 410.0]],
+        dtype=np.float64,
+    )
+    contour.setflags(write=False)
+    return DetectedNucleus(
+        centroid_x=500, centroid_y=400,
+        contour=contour,
+        cell_type=1, cell_type_name="Neoplastic",
+        probability=0.95,
+    )
 
 
-@pytest.fixture()
-def inf_app():
-    return _create_test_app()
+@pytest.fixture(scope="module")
+def fake_result(fake_nuc):
+    return InferenceResult(
+        nuclei=[fake_nuc], tile_x=0, tile_y=0, tile_w=1000, tile_h=1000,
+    )
 
 
-@pytest.fixture()
-def inf_mock_db():
-    return AsyncMock()
+_DEFAULT_BODY = {
+    "slide_id": str(SAMPLE_SLIDE_ID),
+    "x": 0,
+    "y": 0,
+    "width": 1000,
+    "height": 1000,
+}
+_DEFAULT_BODY_BYTES = json.dumps(_DEFAULT_BODY).encode()
+_JSON_HEADERS = {"content-type": "application/json"}
+_FIXED_NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
 
 
 @pytest.fixture()
-def inf_client(inf_app, inf_mock_db):
-    from app.models.database import get_db
+def fast_poll(monkeypatch):
+    """Let the SSE progress loop poll without its 300 ms wall-clock wait."""
+    real_sleep = asyncio.sleep
 
-    async def override_get_db():
-        yield inf_mock_db
+    async def no_wait(delay):
+        await real_sleep(0)
 
-    inf_app.dependency_overrides[get_db] = override_get_db
-    transport = ASGITransport(app=inf_app)
-    return AsyncClient(transport=transport, base_url="http://testserver")
+    monkeypatch.setattr("app.routers.inference.asyncio.sleep", no_wait)
 
 
 class TestViewportStream:
     """Test the SSE infer_viewport_stream endpoint."""
 
-    def _make_request_body(self, **overrides):
-        body = {
-            "slide_id": str(SAMPLE_SLIDE_ID),
-            "x": 0,
-            "y": 0,
-            "width": 1000,
-            "height": 1000,
-        }
-        body.update(overrides)
-        return body
+    @pytest.fixture(autouse=True)
+    def _patch_bulk(self, monkeypatch):
+        monkeypatch.setattr(
+            "app.routers.inference.bulk_insert_nuclei_async",
+            AsyncMock(return_value=1),
+        )
+
+    def _request_kwargs(self, **overrides) -> dict:
+        """httpx kwargs for a viewport request; the default body is pre-encoded."""
+        if not overrides:
+            return {"content": _DEFAULT_BODY_BYTES, "headers": _JSON_HEADERS}
+        return {"json": {**_DEFAULT_BODY, **overrides}}
+
+    async def _first_frame_with(self, client, needle, **overrides) -> str:
+        """Stream the SSE response and return the first chunk containing *needle*."""
+        async with client.stream(
+            "POST",
+            "/api/inference/viewport-stream",
+            **self._request_kwargs(**overrides),
+        ) as resp:
+            # SSE returns 200 with text/event-stream
+            assert resp.status_code == 200
+            async for chunk in resp.aiter_text():
+                if needle in chunk:
+                    return chunk
+        pytest.fail(f"{needle!r} never appeared in the event stream")
 
     @pytest.mark.asyncio
     async def test_slide_not_found(self, inf_client, inf_mock_db):
         """When slide doesn't exist, SSE should stream error event."""
-        inf_mock_db.get.return_value = None
+        inf_mock_db.get_return = None
 
-        resp = await inf_client.post(
-            "/api/inference/viewport-stream",
-            json=self._make_request_body(),
-        )
-        # SSE returns 200 with text/event-stream
-        assert resp.status_code == 200
-        # Parse SSE body for error event
-        assert "Slide not found" in resp.text
+        frame = await self._first_frame_with(inf_client, "Slide not found")
+        assert '"type": "error"' in frame
 
     @pytest.mark.asyncio
     async def test_invalid_bounds(self, inf_client, inf_mock_db):
         """When bounds result in zero or negative dimensions, should stream error."""
         slide = make_slide_row()
-        inf_mock_db.get.return_value = slide
+        inf_mock_db.get_return = slide
 
-        resp = await inf_client.post(
-            "/api/inference/viewport-stream",
-            json=self._make_request_body(width=0, height=0),
+        frame = await self._first_frame_with(
+            inf_client, "Invalid viewport bounds", width=0, height=0,
         )
-        assert resp.status_code == 200
-        assert "Invalid viewport bounds" in resp.text
+        assert '"type": "error"' in frame
 
     @pytest.mark.asyncio
-    @patch("app.routers.inference.bulk_insert_nuclei_async", new_callable=AsyncMock)
     @patch("app.routers.inference.get_slide_service")
     @patch("app.routers.inference.get_inference_engine")
     async def test_successful_inference(
-        self, mock_engine_fn, mock_svc_fn, mock_bulk_insert,
-        inf_client, inf_mock_db,
+        self, mock_engine_fn, mock_svc_fn,
+        inf_client, inf_mock_db, fake_tile, fake_result, fast_poll,
     ):
         """Full successful inference flow through SSE."""
         slide = make_slide_row()
-        inf_mock_db.get.return_value = slide
+        inf_mock_db.get_return = slide
 
         # Mock engine
         mock_engine = MagicMock()
-        from app.services.inference import InferenceResult, DetectedNucleus
-        fake_nuc = DetectedNucleus(
-            centroid_x=500, centroid_y=400,
-            contour=np.array([[490, 390], [510, 390], [510, 410], [490, 410]]),
-            cell_type=1, cell_type_name="Neoplastic",
-            probability=0.95,
-        )
-        fake_result = InferenceResult(nuclei=[fake_nuc], tile_x=0, tile_y=0, tile_w=1000, tile_h=1000)
         mock_engine.infer_tile.return_value = fake_result
         mock_engine_fn.return_value = mock_engine
 
         # Mock slide service
         mock_svc = MagicMock()
-        mock_svc.read_region_l0.return_value = np.zeros((1000, 1000, 3), dtype=np.uint8)
+        mock_svc.read_region_l0.return_value = fake_tile
         mock_svc_fn.return_value = mock_svc
 
-        # Mock bulk insert
-        mock_bulk_insert.return_value = 1
-
         # Mock _assign_analysis_label
         mock_result = MagicMock()
         mock_result.scalars.return_value.all.return_value = []
-        inf_mock_db.execute.return_value = mock_result
-
-        # Mock flush to set box.id
-        async def mock_flush():
-            pass
-
-        inf_mock_db.flush = AsyncMock(side_effect=mock_flush)
-        inf_mock_db.commit = AsyncMock()
-
-        # We also need the box to have a proper id after flush
-        added_objects = []
-        original_add = inf_mock_db.add
+        inf_mock_db.execute_return = mock_result
 
+        # The box needs a proper id once it has been added and flushed
         def capture_add(obj):
-            added_objects.append(obj)
             obj.id = uuid.uuid4()
-            obj.created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+            obj.created_at = _FIXED_NOW
 
         inf_mock_db.add = capture_add
 
         resp = await inf_client.post(
             "/api/inference/viewport-stream",
-            json=self._make_request_body(),
+            **self._request_kwargs(),
         )
         assert resp.status_code == 200
         assert "complete" in resp.text
+        assert inf_mock_db.commits == 1
 
     @pytest.mark.asyncio
     @patch("app.routers.inference.get_slide_service")
@@ -302,54 +270,54 @@ class TestViewportStream:
     ):
         """When inference raises an exception, should stream error event."""
         slide = make_slide_row()
-        inf_mock_db.get.return_value = slide
+        inf_mock_db.get_return = slide
 
         mock_svc = MagicMock()
         mock_svc.read_region_l0.side_effect = RuntimeError("OpenSlide crash")
         mock_svc_fn.return_value = mock_svc
 
-        resp = await inf_client.post(
-            "/api/inference/viewport-stream",
-            json=self._make_request_body(),
-        )
-        assert resp.status_code == 200
-        assert "error" in resp.text
-        assert "Inference failed" in resp.text
+        frame = await self._first_frame_with(inf_client, "Inference failed")
+        assert '"type": "error"' in frame
 
     @pytest.mark.asyncio
-    @patch("app.routers.inference.bulk_insert_nuclei_async", new_callable=AsyncMock)
     @patch("app.routers.inference.get_slide_service")
     @patch("app.routers.inference.get_inference_engine")
     async def test_inference_with_progress(
-        self, mock_engine_fn, mock_svc_fn, mock_bulk_insert,
-        inf_client, inf_mock_db,
+        self, mock_engine_fn, mock_svc_fn,
+        inf_client, inf_mock_db, fake_tile, fake_result, monkeypatch,
     ):
         """Exercise progress_callback (line 167) and the while-loop (branch 190→187)."""
-        import time
         slide = make_slide_row()
-        inf_mock_db.get.return_value = slide
+        inf_mock_db.get_return = slide
 
         mock_engine = MagicMock()
-        from app.services.inference import InferenceResult, DetectedNucleus
-        fake_nuc = DetectedNucleus(
-            centroid_x=500, centroid_y=400,
-            contour=np.array([[490, 390], [510, 390], [510, 410], [490, 410]]),
-            cell_type=1, cell_type_name="Neoplastic",
-            probability=0.95,
-        )
-        fake_result = InferenceResult(
-            nuclei=[fake_nuc], tile_x=0, tile_y=0, tile_w=1000, tile_h=1000,
-        )
+
+        # The polling loop's sleeps drive the worker instead of a wall clock:
+        # poll 1 sees "Step 1" (yield), poll 2 sees it again → exercises
+        # branch 190→187 (no-yield path), poll 3 lets inference finish.
+        step1_reported = threading.Event()
+        release = threading.Event()
+        real_sleep = asyncio.sleep
+        polls = 0
+
+        async def fake_sleep(delay):
+            nonlocal polls
+            polls += 1
+            if polls == 1:
+                step1_reported.wait(timeout=5)
+            elif polls == 3:
+                release.set()
+            await real_sleep(0)
+
+        monkeypatch.setattr("app.routers.inference.asyncio.sleep", fake_sleep)
 
         def slow_infer(**kwargs):
             """Simulate slow inference that calls progress_callback."""
             cb = kwargs.get("progress_callback")
             if cb:
                 cb(1, 10, "Step 1")
-            # Sleep long enough for the while-loop to iterate at least twice
-            # (each iteration sleeps 0.3s).  The second iteration sees the
-            # same progress value → exercises branch 190→187 (no-yield path).
-            time.sleep(1.0)
+            step1_reported.set()
+            release.wait(timeout=5)
             if cb:
                 cb(10, 10, "Done")
             return fake_result
@@ -358,27 +326,24 @@ class TestViewportStream:
         mock_engine_fn.return_value = mock_engine
 
         mock_svc = MagicMock()
-        mock_svc.read_region_l0.return_value = np.zeros((1000, 1000, 3), dtype=np.uint8)
+        mock_svc.read_region_l0.return_value = fake_tile
         mock_svc_fn.return_value = mock_svc
 
-        mock_bulk_insert.return_value = 1
-
         mock_result = MagicMock()
         mock_result.scalars.return_value.all.return_value = []
-        inf_mock_db.execute.return_value = mock_result
-        inf_mock_db.flush = AsyncMock()
-        inf_mock_db.commit = AsyncMock()
+        inf_mock_db.execute_return = mock_result
 
         def capture_add(obj):
             obj.id = uuid.uuid4()
-            obj.created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+            obj.created_at = _FIXED_NOW
 
         inf_mock_db.add = capture_add
 
         resp = await inf_client.post(
             "/api/inference/viewport-stream",
-            json=self._make_request_body(),
+            **self._request_kwargs(),
         )
         assert resp.status_code == 200
         assert "progress" in resp.text
-        assert "complete" in resp.text
\ No newline at end of file
+        assert "complete" in resp.text
+        assert polls >= 3
\ No newline at end of file
@@ -4,45 +4,81 @@ Tests for app.routers.slides — Upload, list, get, DZI, thumbnail, scale-bar.
 from __future__ import annotations
 
 import io
+import shutil
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import MagicMock, patch
 
 import pytest
-from fastapi import FastAPI
-from httpx import ASGITransport, AsyncClient
-
-from app.routers.slides import router, _ALLOWED_EXTENSIONS, _MAX_UPLOAD_BYTES
+from fastapi import HTTPException
+from PIL import Image as PILImage
+
+from app.routers.slides import (
+    _ALLOWED_EXTENSIONS,
+    _MAX_UPLOAD_BYTES,
+    get_dzi,
+    get_dzi_tile,
+    get_scale_bar,
+    get_slide,
+    get_thumbnail,
+    upload_slide,
+)
 from tests.conftest import SAMPLE_SLIDE_ID, make_slide_row
 
+pytestmark = pytest.mark.usefixtures("_override_db")
+
+# Read-only; the routers never mutate the rows they are given.
+_SAMPLE_SLIDE = make_slide_row()
 
-def _create_test_app() -> FastAPI:
-    app = FastAPI()
-    app.include_router(router, prefix="/api")
-    return app
+# Lowest-level regions returned by the mocked OpenSlide handle.  The
+# thumbnail path only ``.convert()``s them (which copies), so one
+# instance each is shared across tests.
+_TEST_IMG_2500 = PILImage.new("RGBA", (2500, 2000), (255, 0, 0, 255))
+_TEST_IMG_100 = PILImage.new("RGBA", (100, 80), (0, 255, 0, 255))
 
 
 @pytest.fixture()
-def app():
-    return _create_test_app()
+def mock_svc_cls(monkeypatch):
+    """``SlideService`` as seen by the router."""
+    mock = MagicMock()
+    monkeypatch.setattr("app.routers.slides.SlideService", mock)
+    return mock
 
 
 @pytest.fixture()
-def mock_db():
-    return AsyncMock()
+def mock_svc_fn(monkeypatch):
+    """``get_slide_service`` as seen by the router."""
+    mock = MagicMock()
+    monkeypatch.setattr("app.routers.slides.get_slide_service", mock)
+    return mock
 
 
 @pytest.fixture()
-def client(app, mock_db):
-    from app.models.database import get_db
+def mock_slide_service(mock_svc_fn):
+    """A three-level slide handed out by ``get_slide_service``."""
+    m = MagicMock()
+    m.level_count = 3
+    m.level_dimensions = [(10000, 8000), (5000, 4000), (2500, 2000)]
+    mock_svc_fn.return_value = m
+    return m
 
-    async def override_get_db():
-        yield mock_db
 
-    app.dependency_overrides[get_db] = override_get_db
-    transport = ASGITransport(app=app)
-    return AsyncClient(transport=transport, base_url="http://testserver")
+@pytest.fixture(scope="module", autouse=True)
+def slides_dir(tmp_path_factory):
+    """One temporary ``settings.slides_dir`` for the module, patched in once."""
+    d = tmp_path_factory.mktemp("slides")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.routers.slides.settings.slides_dir", str(d))
+        yield d
+
+
+@pytest.fixture()
+def thumb_dir(slides_dir):
+    """The thumbnail cache under ``slides_dir``, removed after each test."""
+    d = slides_dir / ".thumbnails"
+    yield d
+    shutil.rmtree(d, ignore_errors=True)
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -59,14 +95,31 @@ class TestConstants:
         assert _MAX_UPLOAD_BYTES == 10 * 1024 * 1024 * 1024
 
 
+# ═══════════════════════════════════════════════════════════════════
+# Unknown slide id → 404
+# ═══════════════════════════════════════════════════════════════════
+@pytest.mark.asyncio
+@pytest.mark.parametrize("handler,kwargs", [
+    pytest.param(get_slide, {}, id="slide"),
+    pytest.param(get_dzi, {}, id="dzi"),
+    pytest.param(get_dzi_tile, {"level": 12, "col": 5, "row": 3}, id="dzi-tile"),
+    pytest.param(get_scale_bar, {}, id="scale-bar"),
+    pytest.param(get_thumbnail, {}, id="thumbnail"),
+])
+async def test_slide_not_found(handler, kwargs, mock_db):
+    mock_db.get_return = None
+    with pytest.raises(HTTPException) as exc_info:
+        await handler(slide_id=SAMPLE_SLIDE_ID, db=mock_db, **kwargs)
+    assert exc_info.value.status_code == 404
+
+
 # ═══════════════════════════════════════════════════════════════════
 # POST /slides/upload
 # ═══════════════════════════════════════════════════════════════════
 class TestUploadSlide:
-    @pytest.mark.asyncio
-    async def test_no_filename(self, client, mock_db):
+    def test_no_filename(self, client, mock_db):
         """Empty filename should return 400 or 422 (multipart validation)."""
-        resp = await client.post(
+        resp = client.post(
             "/api/slides/upload",
             files={"file": ("", b"data")},
         )
@@ -77,48 +130,42 @@ class TestUploadSlide:
     @pytest.mark.asyncio
     async def test_no_filename_direct(self, mock_db):
         """Directly call upload_slide with filename=None to hit line 65."""
-        from app.routers.slides import upload_slide
-        from fastapi import HTTPException
-
-        mock_file = MagicMock()
-        mock_file.filename = None
         with pytest.raises(HTTPException) as exc_info:
-            await upload_slide(file=mock_file, db=mock_db)
+            await upload_slide(file=MagicMock(filename=None), db=mock_db)
         assert exc_info.value.status_code == 400
         assert "No filename" in exc_info.value.detail
 
     @pytest.mark.asyncio
-    async def test_unsupported_extension(self, client, mock_db):
-        resp = await client.post(
-            "/api/slides/upload",
-            files={"file": ("test.jpg", b"data", "image/jpeg")},
-        )
-        assert resp.status_code == 400
-        assert "Unsupported" in resp.json()["detail"]
+    async def test_unsupported_extension(self, mock_db):
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_slide(file=MagicMock(filename="test.jpg"), db=mock_db)
+        assert exc_info.value.status_code == 400
+        assert "Unsupported" in exc_info.value.detail
 
     @pytest.mark.asyncio
-    async def test_path_traversal_sanitized(self, client, mock_db):
-        """Path traversal in filename should be stripped."""
-        # The filename "../../etc/passwd.svs" should be sanitized
-        # to just "passwd.svs" and then processed normally.
-        # It will fail at the OpenSlide stage, not path traversal.
-        with patch("app.routers.slides.SlideService") as MockSvc:
-            MockSvc.side_effect = Exception("test")
-            resp = await client.post(
-                "/api/slides/upload",
-                files={"file": ("../../etc/passwd.svs", b"fake", "application/octet-stream")},
-            )
-            # Should either succeed or fail at WSI open, not with path traversal
-            assert resp.status_code in (201, 422)
+    async def test_path_traversal_sanitized(self, mock_svc_cls, mock_db, slides_dir):
+        """Only the basename of "../../etc/passwd.svs" is kept."""
+        mock_svc_cls.return_value.slide_info.return_value = {
+            "mpp": 0.25, "width_px": 10000, "height_px": 8000,
+        }
+        mock_file = MagicMock(filename="../../etc/passwd.svs", file=io.BytesIO(b"fake"))
 
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.SlideService")
-    async def test_successful_upload(self, mock_svc_cls, client, mock_db, tmp_path):
+        await upload_slide(file=mock_file, db=mock_db)
+
+        (slide,) = mock_db.added
+        assert slide.filename == "passwd.svs"
+        stored = mock_svc_cls.call_args.args[0]
+        assert stored.parent == slides_dir.resolve()
+        assert stored.suffix == ".svs"
+
+    def test_successful_upload(
+        self, mock_svc_cls, client, mock_db, slides_dir, monkeypatch,
+    ):
         """Test the full upload path with mocked file I/O."""
         mock_svc = MagicMock()
         mock_svc.slide_info.return_value = {
             "filename": "test.svs",
-            "filepath": str(tmp_path / "test.svs"),
+            "filepath": str(slides_dir / "test.svs"),
             "mpp": 0.25,
             "width_px": 10000,
             "height_px": 8000,
@@ -140,36 +187,28 @@ class TestUploadSlide:
             obj.created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
 
         mock_db.add = capture_add
-        mock_db.flush = AsyncMock()
-        mock_db.refresh = AsyncMock()
-        mock_db.commit = AsyncMock()
-
-        with patch("app.routers.slides.settings") as mock_settings:
-            mock_settings.slides_dir = str(tmp_path)
-            with patch("builtins.open", MagicMock()):
-                with patch("shutil.copyfileobj"):
-                    resp = await client.post(
-                        "/api/slides/upload",
-                        files={"file": ("test.svs", b"fakedata", "application/octet-stream")},
-                    )
+
+        # Shadow ``open`` in the router module only, so the ASGI stack can
+        # still spool the multipart body to real temporary files.
+        monkeypatch.setattr("app.routers.slides.open", MagicMock(), raising=False)
+        monkeypatch.setattr("shutil.copyfileobj", lambda *a, **k: None)
+        resp = client.post(
+            "/api/slides/upload",
+            files={"file": ("test.svs", b"fakedata", "application/octet-stream")},
+        )
 
         assert resp.status_code == 201
         assert len(added_objects) == 1
         assert added_objects[0].filename == "test.svs"
+        assert mock_db.refreshed == added_objects
+        assert mock_db.commits == 1
 
-    @pytest.mark.asyncio
-    async def test_file_too_large(self, client, mock_db, tmp_path):
+    def test_file_too_large(self, client, mock_db):
         """Files exceeding _MAX_UPLOAD_BYTES should be rejected with 413."""
-        import io
         fake_content = b"x" * 100
 
-        with (
-            patch("app.routers.slides.settings") as mock_settings,
-            patch("app.routers.slides._MAX_UPLOAD_BYTES", 10),  # 10 bytes max
-        ):
-            mock_settings.slides_dir = str(tmp_path)
-
-            resp = await client.post(
+        with patch("app.routers.slides._MAX_UPLOAD_BYTES", 10):  # 10 bytes max
+            resp = client.post(
                 "/api/slides/upload",
                 files={"file": ("big.svs", fake_content, "application/octet-stream")},
             )
@@ -177,106 +216,69 @@ class TestUploadSlide:
             assert "too large" in resp.json()["detail"]
 
     @pytest.mark.asyncio
-    @patch("app.routers.slides.SlideService")
-    async def test_upload_invalid_basename(self, mock_svc_cls, client, mock_db, tmp_path):
-        """PurePosixPath('.').name → '.' with no valid extension → 400."""
-        resp = await client.post(
-            "/api/slides/upload",
-            files={"file": (".", b"data", "application/octet-stream")},
-        )
-        assert resp.status_code == 400
+    async def test_upload_invalid_basename(self, mock_db):
+        """PurePosixPath('.').name has no valid extension → 400."""
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_slide(file=MagicMock(filename="."), db=mock_db)
+        assert exc_info.value.status_code == 400
 
     @pytest.mark.asyncio
-    async def test_upload_empty_basename(self, client, mock_db, tmp_path):
+    async def test_upload_empty_basename(self, mock_db):
         """Filename '/' produces empty basename after sanitization → 400."""
-        resp = await client.post(
-            "/api/slides/upload",
-            files={"file": ("/", b"data", "application/octet-stream")},
-        )
-        assert resp.status_code in (400, 422)  # Empty basename or multipart rejection
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_slide(file=MagicMock(filename="/"), db=mock_db)
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail == "Invalid filename"
 
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.SlideService")
-    async def test_upload_wsi_open_failure(self, mock_svc_cls, client, mock_db, tmp_path):
+    def test_upload_wsi_open_failure(self, mock_svc_cls, client, mock_db, slides_dir):
         """When SlideService raises, the file is cleaned up and 422 returned."""
         mock_svc_cls.side_effect = Exception("Not a valid WSI")
 
-        with patch("app.routers.slides.settings") as mock_settings:
-            mock_settings.slides_dir = str(tmp_path)
-            resp = await client.post(
-                "/api/slides/upload",
-                files={"file": ("test.svs", b"fakedata", "application/octet-stream")},
-            )
+        resp = client.post(
+            "/api/slides/upload",
+            files={"file": ("test.svs", b"fakedata", "application/octet-stream")},
+        )
         assert resp.status_code == 422
         assert "Failed to open WSI" in resp.json()["detail"]
 
     @pytest.mark.asyncio
-    async def test_upload_path_escape(self, client, mock_db, tmp_path):
-        """When resolved dest escapes slides_dir, return 400 (line 92)."""
-        from pathlib import Path
-
-        with patch("app.routers.slides.settings") as mock_settings:
-            mock_settings.slides_dir = str(tmp_path)
-
-            original_resolve = Path.resolve
-
-            def hijack_resolve(self, strict=False):
-                r = original_resolve(self, strict=strict)
-                # If this is a UUID-named .svs file (i.e. the dest), redirect outside
-                if str(r).endswith(".svs") and str(tmp_path) in str(r):
-                    return Path("/etc/evil") / self.name
-                return r
-
-            with patch.object(Path, "resolve", hijack_resolve):
-                resp = await client.post(
-                    "/api/slides/upload",
-                    files={"file": ("test.svs", b"fakedata", "application/octet-stream")},
-                )
-            assert resp.status_code == 400
-            assert "Invalid file path" in resp.json()["detail"]
+    async def test_upload_path_escape(self, mock_db, monkeypatch):
+        """When the resolved dest escapes slides_dir, return 400."""
+        monkeypatch.setattr(
+            "app.routers.slides._resolve_dest",
+            lambda storage, name: Path("/etc/evil") / name,
+        )
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_slide(file=MagicMock(filename="test.svs"), db=mock_db)
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail == "Invalid file path"
 
 
 # ═══════════════════════════════════════════════════════════════════
 # GET /slides/
 # ═══════════════════════════════════════════════════════════════════
 class TestListSlides:
-    @pytest.mark.asyncio
-    async def test_list_slides_empty(self, client, mock_db):
+    @pytest.mark.parametrize("rows,expected_len", [
+        pytest.param([], 0, id="empty"),
+        pytest.param([_SAMPLE_SLIDE], 1, id="with-data"),
+    ])
+    def test_list_slides(self, rows, expected_len, client, mock_db):
         mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = []
-        mock_db.execute.return_value = mock_result
+        mock_result.scalars.return_value.all.return_value = rows
+        mock_db.execute_return = mock_result
 
-        resp = await client.get("/api/slides/")
+        resp = client.get("/api/slides/")
         assert resp.status_code == 200
-        assert resp.json() == []
-
-    @pytest.mark.asyncio
-    async def test_list_slides_with_data(self, client, mock_db):
-        slide = make_slide_row()
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [slide]
-        mock_db.execute.return_value = mock_result
-
-        resp = await client.get("/api/slides/")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert len(data) == 1
+        assert len(resp.json()) == expected_len
 
 
 # ═══════════════════════════════════════════════════════════════════
 # GET /slides/{slide_id}
 # ═══════════════════════════════════════════════════════════════════
 class TestGetSlide:
-    @pytest.mark.asyncio
-    async def test_slide_not_found(self, client, mock_db):
-        mock_db.get.return_value = None
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}")
-        assert resp.status_code == 404
-
-    @pytest.mark.asyncio
-    async def test_get_slide_success(self, client, mock_db):
-        mock_db.get.return_value = make_slide_row()
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}")
+    def test_get_slide_success(self, client, mock_db):
+        mock_db.get_return = _SAMPLE_SLIDE
+        resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}")
         assert resp.status_code == 200
         data = resp.json()
         assert data["filename"] == "test.svs"
@@ -286,21 +288,13 @@ class TestGetSlide:
 # GET /slides/{slide_id}/dzi
 # ═══════════════════════════════════════════════════════════════════
 class TestGetDZI:
-    @pytest.mark.asyncio
-    async def test_dzi_slide_not_found(self, client, mock_db):
-        mock_db.get.return_value = None
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/dzi")
-        assert resp.status_code == 404
-
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.get_slide_service")
-    async def test_dzi_success(self, mock_svc_fn, client, mock_db):
-        mock_db.get.return_value = make_slide_row()
+    def test_dzi_success(self, mock_svc_fn, client, mock_db):
+        mock_db.get_return = _SAMPLE_SLIDE
         mock_svc = MagicMock()
         mock_svc.get_dzi_xml.return_value = '<Image TileSize="254"/>'
         mock_svc_fn.return_value = mock_svc
 
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/dzi")
+        resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/dzi")
         assert resp.status_code == 200
         assert "TileSize" in resp.text
 
@@ -309,33 +303,23 @@ class TestGetDZI:
 # GET /slides/{slide_id}/dzi_files/{level}/{col}_{row}.jpeg
 # ═══════════════════════════════════════════════════════════════════
 class TestGetDZITile:
-    @pytest.mark.asyncio
-    async def test_tile_slide_not_found(self, client, mock_db):
-        mock_db.get.return_value = None
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/dzi_files/12/5_3.jpeg")
-        assert resp.status_code == 404
-
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.get_slide_service")
-    async def test_tile_success(self, mock_svc_fn, client, mock_db):
-        mock_db.get.return_value = make_slide_row()
+    def test_tile_success(self, mock_svc_fn, client, mock_db):
+        mock_db.get_return = _SAMPLE_SLIDE
         mock_svc = MagicMock()
         mock_svc.get_dzi_tile.return_value = b"\xff\xd8\xff\xe0"  # JPEG magic bytes
         mock_svc_fn.return_value = mock_svc
 
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/dzi_files/12/5_3.jpeg")
+        resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/dzi_files/12/5_3.jpeg")
         assert resp.status_code == 200
         assert resp.headers["content-type"] == "image/jpeg"
 
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.get_slide_service")
-    async def test_tile_not_found(self, mock_svc_fn, client, mock_db):
-        mock_db.get.return_value = make_slide_row()
+    def test_tile_not_found(self, mock_svc_fn, client, mock_db):
+        mock_db.get_return = _SAMPLE_SLIDE
         mock_svc = MagicMock()
         mock_svc.get_dzi_tile.side_effect = ValueError("Invalid tile")
         mock_svc_fn.return_value = mock_svc
 
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/dzi_files/99/99_99.jpeg")
+        resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/dzi_files/99/99_99.jpeg")
         assert resp.status_code == 404
 
 
@@ -343,143 +327,78 @@ class TestGetDZITile:
 # GET /slides/{slide_id}/scale-bar
 # ═══════════════════════════════════════════════════════════════════
 class TestScaleBar:
-    @pytest.mark.asyncio
-    async def test_scale_bar_slide_not_found(self, client, mock_db):
-        mock_db.get.return_value = None
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/scale-bar")
-        assert resp.status_code == 404
-
-    @pytest.mark.asyncio
-    async def test_scale_bar_default(self, client, mock_db):
-        mock_db.get.return_value = make_slide_row()
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/scale-bar")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert data["target_um"] == 100.0
-        assert data["level"] == 0
-        assert data["mpp"] == 0.25
+    @pytest.mark.parametrize("qs,target_um,level,pixels", [
         # 100 / 0.25 = 400
-        assert data["pixels_at_level"] == 400.0
-
-    @pytest.mark.asyncio
-    async def test_scale_bar_custom_params(self, client, mock_db):
-        mock_db.get.return_value = make_slide_row()
-        resp = await client.get(
-            f"/api/slides/{SAMPLE_SLIDE_ID}/scale-bar?target_um=50&level=1"
-        )
+        pytest.param("", 100.0, 0, 400.0, id="default"),
+        # 50 / (0.25 * 2) = 100
+        pytest.param("?target_um=50&level=1", 50.0, 1, 100.0, id="custom-params"),
+    ])
+    def test_scale_bar(self, qs, target_um, level, pixels, client, mock_db):
+        mock_db.get_return = _SAMPLE_SLIDE
+        resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/scale-bar{qs}")
         assert resp.status_code == 200
         data = resp.json()
-        assert data["target_um"] == 50.0
-        assert data["level"] == 1
-        # 50 / (0.25 * 2) = 100
-        assert data["pixels_at_level"] == 100.0
+        assert data["target_um"] == target_um
+        assert data["level"] == level
+        assert data["mpp"] == 0.25
+        assert data["pixels_at_level"] == pixels
 
 
 # ═══════════════════════════════════════════════════════════════════
 # GET /slides/{slide_id}/thumbnail
 # ═══════════════════════════════════════════════════════════════════
 class TestThumbnail:
-    @pytest.mark.asyncio
-    async def test_thumbnail_slide_not_found(self, client, mock_db):
-        mock_db.get.return_value = None
-        resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
-        assert resp.status_code == 404
-
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.get_slide_service")
-    async def test_thumbnail_cached(self, mock_svc_fn, client, mock_db, tmp_path):
+    def test_thumbnail_cached(self, mock_svc_fn, client, mock_db, thumb_dir):
         """When a cached thumbnail exists, it should be served directly."""
-        mock_db.get.return_value = make_slide_row()
-
-        with patch("app.routers.slides.settings") as mock_settings:
-            mock_settings.slides_dir = str(tmp_path)
+        mock_db.get_return = _SAMPLE_SLIDE
 
-            # Create cached thumbnail
-            cache_dir = tmp_path / ".thumbnails"
-            cache_dir.mkdir()
-            cache_file = cache_dir / f"{SAMPLE_SLIDE_ID}_200.jpg"
-            cache_file.write_bytes(b"\xff\xd8fake_jpeg")
+        # Create cached thumbnail
+        thumb_dir.mkdir()
+        cache_file = thumb_dir / f"{SAMPLE_SLIDE_ID}_200.jpg"
+        cache_file.write_bytes(b"\xff\xd8fake_jpeg")
 
-            resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
-            assert resp.status_code == 200
-            assert resp.headers["content-type"] == "image/jpeg"
+        resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "image/jpeg"
 
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.get_slide_service")
-    async def test_thumbnail_generated(self, mock_svc_fn, client, mock_db, tmp_path):
+    def test_thumbnail_generated(self, mock_slide_service, client, mock_db, thumb_dir):
         """When no cached thumbnail exists, generate and cache it."""
-        from PIL import Image as PILImage
+        mock_db.get_return = _SAMPLE_SLIDE
 
-        mock_db.get.return_value = make_slide_row()
+        with patch("app.services.slide._tls_open") as mock_tls_open:
+            mock_slide_handle = MagicMock()
+            mock_slide_handle.read_region.return_value = _TEST_IMG_2500
+            mock_tls_open.return_value = mock_slide_handle
 
-        mock_svc = MagicMock()
-        mock_svc.level_count = 3
-        mock_svc.level_dimensions = [(10000, 8000), (5000, 4000), (2500, 2000)]
-        mock_svc_fn.return_value = mock_svc
-
-        # Create a real small image that the mocked OpenSlide would return
-        test_img = PILImage.new("RGBA", (2500, 2000), (255, 0, 0, 255))
-
-        with patch("app.routers.slides.settings") as mock_settings:
-            mock_settings.slides_dir = str(tmp_path)
-
-            with patch("app.services.slide._tls_open") as mock_tls_open:
-                mock_slide_handle = MagicMock()
-                mock_slide_handle.read_region.return_value = test_img
-                mock_tls_open.return_value = mock_slide_handle
-
-                resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
-                assert resp.status_code == 200
-                assert resp.headers["content-type"] == "image/jpeg"
+            resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
+            assert resp.status_code == 200
+            assert resp.headers["content-type"] == "image/jpeg"
 
-                # Verify the thumbnail was cached
-                cache_file = tmp_path / ".thumbnails" / f"{SAMPLE_SLIDE_ID}_200.jpg"
-                assert cache_file.exists()
+            # Verify the thumbnail was cached
+            cache_file = thumb_dir / f"{SAMPLE_SLIDE_ID}_200.jpg"
+            assert cache_file.exists()
 
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.get_slide_service")
-    async def test_thumbnail_generation_error(self, mock_svc_fn, client, mock_db, tmp_path):
+    def test_thumbnail_generation_error(self, mock_slide_service, client, mock_db, thumb_dir):
         """When thumbnail generation fails, return 500."""
-        mock_db.get.return_value = make_slide_row()
+        mock_db.get_return = _SAMPLE_SLIDE
 
-        mock_svc = MagicMock()
-        mock_svc.level_count = 3
-        mock_svc.level_dimensions = [(10000, 8000), (5000, 4000), (2500, 2000)]
-        mock_svc_fn.return_value = mock_svc
+        with patch("app.services.slide._tls_open") as mock_tls_open:
+            mock_tls_open.side_effect = RuntimeError("OpenSlide error")
 
-        with patch("app.routers.slides.settings") as mock_settings:
-            mock_settings.slides_dir = str(tmp_path)
+            resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
+            assert resp.status_code == 500
+            assert "Failed to generate thumbnail" in resp.json()["detail"]
 
-            with patch("app.services.slide._tls_open") as mock_tls_open:
-                mock_tls_open.side_effect = RuntimeError("OpenSlide error")
-
-                resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
-                assert resp.status_code == 500
-                assert "Failed to generate thumbnail" in resp.json()["detail"]
-
-    @pytest.mark.asyncio
-    @patch("app.routers.slides.get_slide_service")
-    async def test_thumbnail_no_downscale_needed(self, mock_svc_fn, client, mock_db, tmp_path):
+    def test_thumbnail_no_downscale_needed(self, mock_slide_service, client, mock_db, thumb_dir):
         """When the lowest-resolution level is already small, no downscale needed."""
-        from PIL import Image as PILImage
+        mock_db.get_return = _SAMPLE_SLIDE
 
-        mock_db.get.return_value = make_slide_row()
+        mock_slide_service.level_dimensions[-1] = (100, 80)
 
-        mock_svc = MagicMock()
-        mock_svc.level_count = 3
-        mock_svc.level_dimensions = [(10000, 8000), (5000, 4000), (100, 80)]
-        mock_svc_fn.return_value = mock_svc
-
-        # Small image (100x80) — smaller than max_size (200)
-        test_img = PILImage.new("RGBA", (100, 80), (0, 255, 0, 255))
+        with patch("app.services.slide._tls_open") as mock_tls_open:
+            mock_slide_handle = MagicMock()
+            mock_slide_handle.read_region.return_value = _TEST_IMG_100  # below max_size (200)
+            mock_tls_open.return_value = mock_slide_handle
 
-        with patch("app.routers.slides.settings") as mock_settings:
-            mock_settings.slides_dir = str(tmp_path)
-
-            with patch("app.services.slide._tls_open") as mock_tls_open:
-                mock_slide_handle = MagicMock()
-                mock_slide_handle.read_region.return_value = test_img
-                mock_tls_open.return_value = mock_slide_handle
-
-                resp = await client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
-                assert resp.status_code == 200
+            resp = client.get(f"/api/slides/{SAMPLE_SLIDE_ID}/thumbnail")
+            assert resp.status_code == 200
@@ -3,11 +3,10 @@ Tests for app.schemas.nucleus — Pydantic request/response schemas.
 """
 from __future__ import annotations
 
-import uuid
 from datetime import datetime, timezone
 
 import pytest
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
 from app.schemas.nucleus import (
     AnalysisBoxDetail,
@@ -24,6 +23,10 @@ from app.schemas.nucleus import (
     ViewportNucleiResponse,
     ViewportQuery,
 )
+from tests.conftest import SAMPLE_BOX_ID, SAMPLE_SLIDE_ID
+
+# Fixed timestamp; no schema test depends on the wall clock.
+_NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -32,12 +35,12 @@ from app.schemas.nucleus import (
 class TestSlideOut:
     def test_valid(self):
         s = SlideOut(
-            id=uuid.uuid4(),
+            id=SAMPLE_SLIDE_ID,
             filename="test.svs",
             mpp=0.25,
             width_px=10000,
             height_px=8000,
-            created_at=datetime.now(timezone.utc),
+            created_at=_NOW,
         )
         assert s.filename == "test.svs"
         assert s.mpp == 0.25
@@ -98,30 +101,35 @@ class TestCellTypeCount:
 # ═══════════════════════════════════════════════════════════════════
 # AnalysisBox schemas
 # ═══════════════════════════════════════════════════════════════════
-class TestAnalysisBoxSchemas:
-    def _make_box_out(self, **kw):
-        defaults = dict(
-            id=uuid.uuid4(),
-            slide_id=uuid.uuid4(),
-            label="Analysis 1",
-            x_min=0.0, y_min=0.0, x_max=1000.0, y_max=1000.0,
-            total_nuclei=100,
-            area_mm2=0.0625,
-            density_per_mm2=1600.0,
-            neoplastic_ratio=0.3,
-            cell_type_counts={"1": {"count": 30, "name": "Neoplastic"}},
-            created_at=datetime.now(timezone.utc),
-        )
-        defaults.update(kw)
-        return AnalysisBoxOut(**defaults)
+# Trusted field values; validated once by the module-scoped ``box``
+# fixture, otherwise fed to ``model_construct`` or the detail schema.
+_BOX_DEFAULTS = dict(
+    id=SAMPLE_BOX_ID,
+    slide_id=SAMPLE_SLIDE_ID,
+    label="Analysis 1",
+    x_min=0.0, y_min=0.0, x_max=1000.0, y_max=1000.0,
+    total_nuclei=100,
+    area_mm2=0.0625,
+    density_per_mm2=1600.0,
+    neoplastic_ratio=0.3,
+    cell_type_counts={"1": {"count": 30, "name": "Neoplastic"}},
+    created_at=_NOW,
+)
+
+
+@pytest.fixture(scope="module")
+def box() -> AnalysisBoxOut:
+    """One validated box; the tests only read it."""
+    return AnalysisBoxOut.model_validate(_BOX_DEFAULTS)
 
-    def test_analysis_box_out(self):
-        b = self._make_box_out()
-        assert b.total_nuclei == 100
+
+class TestAnalysisBoxSchemas:
+    def test_analysis_box_out(self, box):
+        assert box.total_nuclei == 100
 
     def test_analysis_box_detail(self):
         d = AnalysisBoxDetail(
-            **self._make_box_out().model_dump(),
+            **_BOX_DEFAULTS,
             cell_type_breakdown=[
                 CellTypeCount(cell_type=1, cell_type_name="Neoplastic", count=30, fraction=0.3),
             ],
@@ -135,7 +143,7 @@ class TestAnalysisBoxSchemas:
         assert d.viability == 0.95
 
     def test_analysis_box_detail_defaults(self):
-        d = AnalysisBoxDetail(**self._make_box_out().model_dump())
+        d = AnalysisBoxDetail.model_construct(**_BOX_DEFAULTS)
         assert d.cell_type_breakdown == []
         assert d.shannon_h == 0.0
         assert d.inflammatory_index == 0.0
@@ -143,8 +151,7 @@ class TestAnalysisBoxSchemas:
         assert d.ne_epithelial_ratio is None
         assert d.viability == 0.0
 
-    def test_analysis_box_list_response(self):
-        box = self._make_box_out()
+    def test_analysis_box_list_response(self, box):
         resp = AnalysisBoxListResponse(
             slide_id=box.slide_id,
             boxes=[box],
@@ -155,35 +162,30 @@ class TestAnalysisBoxSchemas:
 # ═══════════════════════════════════════════════════════════════════
 # ViewportQuery
 # ═══════════════════════════════════════════════════════════════════
-class TestViewportQuery:
-    def test_valid(self):
-        vq = ViewportQuery(
-            slide_id=uuid.uuid4(),
-            x=100, y=200, width=300, height=400, level=0,
-        )
-        assert vq.level == 0
+_VIEWPORT_ADAPTER = TypeAdapter(list[ViewportQuery])
+_VQ_VALIDATE = ViewportQuery.__pydantic_validator__.validate_python
 
-    def test_default_level(self):
-        vq = ViewportQuery(
-            slide_id=uuid.uuid4(),
-            x=100, y=200, width=300, height=400,
-        )
-        assert vq.level == 0
+
+class TestViewportQuery:
+    def test_valid_levels(self):
+        """Explicit 0, omitted (defaults to 0) and positive levels validate in one pass."""
+        explicit, default, positive = _VIEWPORT_ADAPTER.validate_python([
+            dict(slide_id=SAMPLE_SLIDE_ID, x=100, y=200, width=300, height=400, level=0),
+            dict(slide_id=SAMPLE_SLIDE_ID, x=100, y=200, width=300, height=400),
+            dict(slide_id=SAMPLE_SLIDE_ID, x=0, y=0, width=100, height=100, level=5),
+        ])
+        assert explicit.level == 0
+        assert default.level == 0
+        assert positive.level == 5
 
     def test_negative_level_rejected(self):
+        # Straight to the core validator; only the rejection matters here.
         with pytest.raises(ValidationError):
-            ViewportQuery(
-                slide_id=uuid.uuid4(),
+            _VQ_VALIDATE(dict(
+                slide_id=SAMPLE_SLIDE_ID,
                 x=100, y=200, width=300, height=400,
                 level=-1,
-            )
-
-    def test_positive_level_accepted(self):
-        vq = ViewportQuery(
-            slide_id=uuid.uuid4(),
-            x=0, y=0, width=100, height=100, level=5,
-        )
-        assert vq.level == 5
+            ))
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -192,7 +194,7 @@ class TestViewportQuery:
 class TestViewportNucleiResponse:
     def test_valid(self):
         resp = ViewportNucleiResponse(
-            slide_id=uuid.uuid4(),
+            slide_id=SAMPLE_SLIDE_ID,
             bounds_l0={"x_min": 0, "y_min": 0, "x_max": 100, "y_max": 100},
             nuclei=[],
         )
@@ -205,14 +207,14 @@ class TestViewportNucleiResponse:
 class TestInferenceViewportRequest:
     def test_valid(self):
         req = InferenceViewportRequest(
-            slide_id=uuid.uuid4(),
+            slide_id=SAMPLE_SLIDE_ID,
             x=0, y=0, width=512, height=512, level=0,
         )
         assert req.width == 512
 
     def test_default_level(self):
         req = InferenceViewportRequest(
-            slide_id=uuid.uuid4(),
+            slide_id=SAMPLE_SLIDE_ID,
             x=0, y=0, width=100, height=100,
         )
         assert req.level == 0
@@ -221,37 +223,36 @@ class TestInferenceViewportRequest:
 # ═══════════════════════════════════════════════════════════════════
 # ROI schemas
 # ═══════════════════════════════════════════════════════════════════
-class TestROISchemas:
-    def test_roi_stats_request(self):
-        req = ROIStatsRequest(
-            slide_id=uuid.uuid4(),
-            x_min=0, y_min=0, x_max=1000, y_max=1000,
-        )
-        assert req.x_max == 1000
-
-    def test_roi_stats_response(self):
-        resp = ROIStatsResponse(
-            slide_id=uuid.uuid4(),
-            total_nuclei=100,
-            area_mm2=1.0,
-            density_per_mm2=100.0,
-            neoplastic_ratio=0.3,
-            cell_type_breakdown=[],
-            mpp=0.25,
-            bounds_l0={"x_min": 0, "y_min": 0, "x_max": 1000, "y_max": 1000},
-        )
-        assert resp.density_per_mm2 == 100.0
+def test_roi_stats_request():
+    req = ROIStatsRequest(
+        slide_id=SAMPLE_SLIDE_ID,
+        x_min=0, y_min=0, x_max=1000, y_max=1000,
+    )
+    assert req.x_max == 1000
+
+
+def test_roi_stats_response():
+    resp = ROIStatsResponse(
+        slide_id=SAMPLE_SLIDE_ID,
+        total_nuclei=100,
+        area_mm2=1.0,
+        density_per_mm2=100.0,
+        neoplastic_ratio=0.3,
+        cell_type_breakdown=[],
+        mpp=0.25,
+        bounds_l0={"x_min": 0, "y_min": 0, "x_max": 1000, "y_max": 1000},
+    )
+    assert resp.density_per_mm2 == 100.0
 
 
 # ═══════════════════════════════════════════════════════════════════
 # ScaleBarResponse
 # ═══════════════════════════════════════════════════════════════════
-class TestScaleBarResponse:
-    def test_valid(self):
-        sb = ScaleBarResponse(
-            target_um=100.0,
-            pixels_at_level=400.0,
-            level=0,
-            mpp=0.25,
-        )
-        assert sb.pixels_at_level == 400.0
+def test_scale_bar_response():
+    sb = ScaleBarResponse(
+        target_um=100.0,
+        pixels_at_level=400.0,
+        level=0,
+        mpp=0.25,
+    )
+    assert sb.pixels_at_level == 400.0
@@ -1,11 +1,14 @@
 """
-Tests for app.services.bulk_insert — WKT conversion, NucleiStreamer,
-log suppression, and bulk insert.
+Tests for app.services.bulk_insert — NucleiStreamer, log suppression,
+and bulk insert.  The pure WKT conversion tests live in
+``tests/fast/test_contour_to_wkt.py``.
 """
 from __future__ import annotations
 
 import logging
-import uuid
+import re
+from types import SimpleNamespace
+from typing import NamedTuple
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import numpy as np
@@ -13,94 +16,61 @@ import pytest
 
 from app.services.bulk_insert import (
     NucleiStreamer,
-    _contour_to_wkt,
     _flush_async_buffer,
     _INSERT_SQL,
     bulk_insert_nuclei_async,
     suppress_sql_logging,
 )
+from tests.conftest import SAMPLE_BOX_ID, SAMPLE_SLIDE_ID
 
-
-# ═══════════════════════════════════════════════════════════════════
-# _contour_to_wkt
-# ═══════════════════════════════════════════════════════════════════
-class TestContourToWkt:
-    def test_none_contour(self):
-        assert _contour_to_wkt(None) is None
-
-    def test_too_few_points(self):
-        assert _contour_to_wkt([[0, 0], [1, 1]]) is None
-
-    def test_1d_array(self):
-        """1-D array should fail (ndim != 2)."""
-        assert _contour_to_wkt([1, 2, 3]) is None
-
-    def test_valid_triangle(self):
-        contour = [[0, 0], [10, 0], [10, 10]]
-        wkt = _contour_to_wkt(contour)
-        assert wkt is not None
-        assert "POLYGON" in wkt
-
-    def test_valid_square(self):
-        contour = [[0, 0], [10, 0], [10, 10], [0, 10]]
-        wkt = _contour_to_wkt(contour)
-        assert "POLYGON" in wkt
-
-    def test_already_closed_ring(self):
-        contour = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
-        wkt = _contour_to_wkt(contour)
-        assert "POLYGON" in wkt
-
-    def test_ndarray_input(self):
-        arr = np.array([[0, 0], [5, 0], [5, 5], [0, 5]], dtype=np.float64)
-        wkt = _contour_to_wkt(arr)
-        assert "POLYGON" in wkt
-
-    def test_invalid_polygon_collinear(self):
-        """Three collinear points form a degenerate polygon.
-        Shapely may still consider it valid (as a zero-area polygon),
-        so just verify we get a non-None result (it's still a valid WKT)
-        or None depending on Shapely version."""
-        contour = [[0, 0], [5, 0], [10, 0]]
-        result = _contour_to_wkt(contour)
-        # Shapely 2.x may return None for degenerate polygons
-        # or may return a valid WKT — both are acceptable.
-        assert result is None or "POLYGON" in result
+# Ids as the streamer and asyncpg rows carry them (plain strings).
+_SLIDE_ID = str(SAMPLE_SLIDE_ID)
+_BOX_ID = str(SAMPLE_BOX_ID)
 
 
 # ═══════════════════════════════════════════════════════════════════
 # suppress_sql_logging
 # ═══════════════════════════════════════════════════════════════════
-class TestSuppressSqlLogging:
-    def test_suppresses_and_restores(self):
-        sa_logger = logging.getLogger("sqlalchemy.engine")
-        original = sa_logger.level
+_SA_LOGGER = logging.getLogger("sqlalchemy.engine")
 
-        with suppress_sql_logging():
-            assert sa_logger.level == logging.WARNING
 
-        assert sa_logger.level == original
+def test_suppresses_and_restores():
+    original = _SA_LOGGER.level
+
+    with suppress_sql_logging():
+        assert _SA_LOGGER.level == logging.WARNING
 
-    def test_restores_on_exception(self):
-        sa_logger = logging.getLogger("sqlalchemy.engine")
-        original = sa_logger.level
+    assert _SA_LOGGER.level == original
 
-        with pytest.raises(RuntimeError):
-            with suppress_sql_logging():
-                raise RuntimeError("boom")
 
-        assert sa_logger.level == original
+def test_restores_on_exception():
+    original = _SA_LOGGER.level
+
+    with pytest.raises(RuntimeError):
+        with suppress_sql_logging():
+            raise RuntimeError("boom")
+
+    assert _SA_LOGGER.level == original
 
 
 # ═══════════════════════════════════════════════════════════════════
 # NucleiStreamer
 # ═══════════════════════════════════════════════════════════════════
+# Shared by every default nucleus; the streamer only reads it.  float64
+# and C-contiguous, as InferenceEngine emits and _contour_to_wkt expects.
+_DEFAULT_CONTOUR = np.ascontiguousarray(
+    [[90.0, 190.0], [110.0, 190.0], [110.0, 210.0], [90.0, 210.0]],
+    dtype=np.float64,
+)
+_DEFAULT_CONTOUR.setflags(write=False)
+
+
 class TestNucleiStreamer:
     def _make_nucleus(self, **overrides):
         defaults = dict(
             centroid_x=100.0,
             centroid_y=200.0,
-            contour=np.array([[90, 190], [110, 190], [110, 210], [90, 210]]),
+            contour=_DEFAULT_CONTOUR,
             cell_type=1,
             cell_type_name="Neoplastic",
             probability=0.95,
@@ -108,12 +78,10 @@ class TestNucleiStreamer:
             perimeter_um=20.0,
         )
         defaults.update(overrides)
-        return MagicMock(**defaults)
+        return SimpleNamespace(**defaults)
 
     def test_basic_streaming(self):
-        slide_id = str(uuid.uuid4())
-        box_id = str(uuid.uuid4())
-        streamer = NucleiStreamer(slide_id=slide_id, mpp=0.25, analysis_box_id=box_id)
+        streamer = NucleiStreamer(slide_id=_SLIDE_ID, mpp=0.25, analysis_box_id=_BOX_ID)
 
         nuclei = [self._make_nucleus(), self._make_nucleus(cell_type=2, cell_type_name="Inflammatory")]
         rows = list(streamer.from_viewport_result(nuclei))
@@ -121,8 +89,8 @@ class TestNucleiStreamer:
         assert len(rows) == 2
         # Check first row structure
         row = rows[0]
-        assert row[0] == slide_id
-        assert row[1] == box_id
+        assert row[0] == _SLIDE_ID
+        assert row[1] == _BOX_ID
         assert row[2] == 100.0  # centroid_x
         assert row[3] == 200.0  # centroid_y
         assert row[4] is not None  # contour_wkt
@@ -133,18 +101,18 @@ class TestNucleiStreamer:
         assert row[9] == 20.0
 
     def test_none_box_id(self):
-        streamer = NucleiStreamer(slide_id=str(uuid.uuid4()), mpp=0.25, analysis_box_id=None)
+        streamer = NucleiStreamer(slide_id=_SLIDE_ID, mpp=0.25, analysis_box_id=None)
         assert streamer.analysis_box_id is None
 
     def test_empty_nuclei(self):
-        streamer = NucleiStreamer(slide_id=str(uuid.uuid4()), mpp=0.25)
+        streamer = NucleiStreamer(slide_id=_SLIDE_ID, mpp=0.25)
         rows = list(streamer.from_viewport_result([]))
         assert rows == []
 
     def test_zero_area_nucleus(self):
         """Nucleus with area_um2=0 should still yield a row."""
         nuc = self._make_nucleus(area_um2=0, perimeter_um=0)
-        streamer = NucleiStreamer(slide_id=str(uuid.uuid4()), mpp=0.25)
+        streamer = NucleiStreamer(slide_id=_SLIDE_ID, mpp=0.25)
         rows = list(streamer.from_viewport_result([nuc]))
         assert len(rows) == 1
         # area_um2=0 is falsy, so it becomes None
@@ -153,13 +121,13 @@ class TestNucleiStreamer:
     def test_none_contour(self):
         """Nucleus with invalid contour should yield None wkt."""
         nuc = self._make_nucleus(contour=None)
-        streamer = NucleiStreamer(slide_id=str(uuid.uuid4()), mpp=0.25)
+        streamer = NucleiStreamer(slide_id=_SLIDE_ID, mpp=0.25)
         rows = list(streamer.from_viewport_result([nuc]))
         assert rows[0][4] is None
 
     def test_default_mpp_used(self):
         """When mpp is None, falls back to settings.default_mpp."""
-        streamer = NucleiStreamer(slide_id=str(uuid.uuid4()), mpp=None)
+        streamer = NucleiStreamer(slide_id=_SLIDE_ID, mpp=None)
         # Should use the default (0.25 from settings)
         assert streamer.mpp > 0
 
@@ -167,72 +135,81 @@ class TestNucleiStreamer:
 # ═══════════════════════════════════════════════════════════════════
 # bulk_insert_nuclei_async
 # ═══════════════════════════════════════════════════════════════════
+class _AsyncpgChain(NamedTuple):
+    session: AsyncMock
+    driver: AsyncMock
+
+
+@pytest.fixture(scope="module")
+def _asyncpg_chain() -> _AsyncpgChain:
+    """session → connection → raw_connection → driver_connection, built once."""
+    driver = AsyncMock()
+    raw_conn = MagicMock()
+    raw_conn.driver_connection = driver
+    sa_conn = AsyncMock()
+    sa_conn.get_raw_connection.return_value = raw_conn
+
+    session = AsyncMock()
+    session.connection.return_value = sa_conn
+    return _AsyncpgChain(session, driver)
+
+
+@pytest.fixture()
+def asyncpg_mocks(_asyncpg_chain) -> _AsyncpgChain:
+    """The shared chain with the driver's call history cleared."""
+    _asyncpg_chain.driver.reset_mock()
+    return _asyncpg_chain
+
+
 class TestBulkInsertNucleiAsync:
-    @pytest.mark.asyncio
     async def test_empty_iterator(self):
         session = AsyncMock()
         total = await bulk_insert_nuclei_async(session, iter([]), page_size=10)
         assert total == 0
 
-    @pytest.mark.asyncio
-    async def test_inserts_rows(self):
+    async def test_inserts_rows(self, asyncpg_mocks):
         """Verify rows flow through to asyncpg executemany."""
-        # Set up mock chain: session → connection → raw_connection → driver_connection
-        mock_driver = AsyncMock()
-        mock_raw_conn = MagicMock()
-        mock_raw_conn.driver_connection = mock_driver
-        mock_sa_conn = AsyncMock()
-        mock_sa_conn.get_raw_connection.return_value = mock_raw_conn
-
-        mock_session = AsyncMock()
-        mock_session.connection.return_value = mock_sa_conn
-
-        slide_id = str(uuid.uuid4())
-        box_id = str(uuid.uuid4())
-
         rows = [
-            (slide_id, box_id, 10.0, 20.0, "POLYGON((0 0, 1 0, 1 1, 0 0))", 1, "Neoplastic", 0.9, 5.0, 3.0),
-            (slide_id, box_id, 30.0, 40.0, None, 2, "Inflammatory", 0.8, None, None),
+            (_SLIDE_ID, _BOX_ID, 10.0, 20.0, "POLYGON((0 0, 1 0, 1 1, 0 0))", 1, "Neoplastic", 0.9, 5.0, 3.0),
+            (_SLIDE_ID, _BOX_ID, 30.0, 40.0, None, 2, "Inflammatory", 0.8, None, None),
         ]
 
-        total = await bulk_insert_nuclei_async(mock_session, iter(rows), page_size=10)
+        total = await bulk_insert_nuclei_async(asyncpg_mocks.session, iter(rows), page_size=10)
         assert total == 2
-        assert mock_driver.executemany.called
+        assert asyncpg_mocks.driver.executemany.called
 
-    @pytest.mark.asyncio
-    async def test_page_size_flushing(self):
+    async def test_page_size_flushing(self, asyncpg_mocks, monkeypatch):
         """Verify buffer flushes at page_size boundary."""
-        mock_driver = AsyncMock()
-        mock_raw_conn = MagicMock()
-        mock_raw_conn.driver_connection = mock_driver
-        mock_sa_conn = AsyncMock()
-        mock_sa_conn.get_raw_connection.return_value = mock_raw_conn
+        flushes = 0
 
-        mock_session = AsyncMock()
-        mock_session.connection.return_value = mock_sa_conn
+        async def count_executemany(*args, **kwargs):
+            nonlocal flushes
+            flushes += 1
 
-        slide_id = str(uuid.uuid4())
-        box_id = str(uuid.uuid4())
+        monkeypatch.setattr(asyncpg_mocks.driver, "executemany", count_executemany)
 
-        # 5 rows with page_size=2 → 3 flushes (2 + 2 + 1)
-        rows = [
-            (slide_id, box_id, float(i), float(i), None, 0, "Background", 0.1, None, None)
-            for i in range(5)
-        ]
+        # 5 rows with page_size=2 → 3 flushes (2 + 2 + 1); only the
+        # centroid varies, so the rest of each row is spliced in.
+        prefix = (_SLIDE_ID, _BOX_ID)
+        suffix = (None, 0, "Background", 0.1, None, None)
+        rows = [(*prefix, c, c, *suffix) for c in np.arange(5, dtype=np.float64).tolist()]
 
-        total = await bulk_insert_nuclei_async(mock_session, iter(rows), page_size=2)
+        total = await bulk_insert_nuclei_async(asyncpg_mocks.session, iter(rows), page_size=2)
         assert total == 5
-        assert mock_driver.executemany.call_count == 3
+        assert flushes == 3
 
 
 # ═══════════════════════════════════════════════════════════════════
 # _INSERT_SQL sanity
 # ═══════════════════════════════════════════════════════════════════
+_BIND_PARAM_RE = re.compile(r"\$(\d+)")
+
+
 class TestInsertSQL:
     def test_sql_has_all_parameters(self):
         """Verify all 10 $N bind params are present."""
-        for i in range(1, 11):
-            assert f"${i}" in _INSERT_SQL
+        found = set(_BIND_PARAM_RE.findall(_INSERT_SQL))
+        assert found >= {str(i) for i in range(1, 11)}
 
     def test_no_string_interpolation(self):
         """No Python format strings or f-string markers."""
@@ -4,14 +4,16 @@ progress tracking, device selection, and output parsing.
 """
 from __future__ import annotations
 
-import math
+import sys
 from dataclasses import dataclass
+from types import SimpleNamespace
 from typing import Any
-from unittest.mock import MagicMock, patch, PropertyMock
+from unittest.mock import MagicMock
 
 import numpy as np
 import pytest
 
+from app.services import inference as _inference_mod
 from app.services.inference import (
     DetectedNucleus,
     HoVerNetEngine,
@@ -21,6 +23,31 @@ from app.services.inference import (
 )
 
 
+@pytest.fixture(scope="module")
+def cpu_device():
+    """Pin ``_select_device`` to CPU once for the whole module."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.services.inference._select_device", lambda requested=None: "cpu")
+        yield
+
+
+@pytest.fixture(scope="module")
+def engine(cpu_device) -> HoVerNetEngine:
+    """Engine without a loaded model (skips TIAToolbox); tests only read it."""
+    return HoVerNetEngine(device="cpu")
+
+
+@pytest.fixture(scope="module")
+def loaded_engine(cpu_device) -> HoVerNetEngine:
+    """Engine marked as loaded, shared by the module; tests install ``_model``."""
+    eng = HoVerNetEngine(device="cpu")
+    eng._ioconfig = SimpleNamespace(
+        patch_input_shape=[256, 256], patch_output_shape=[164, 164],
+    )
+    eng._loaded = True
+    return eng
+
+
 # ═══════════════════════════════════════════════════════════════════
 # ProgressTracker
 # ═══════════════════════════════════════════════════════════════════
@@ -93,335 +120,325 @@ class TestDetectedNucleus:
 # ═══════════════════════════════════════════════════════════════════
 # _select_device
 # ═══════════════════════════════════════════════════════════════════
+@pytest.fixture()
+def device_env(monkeypatch) -> SimpleNamespace:
+    """Fake ``settings`` and ``torch`` seen by ``_select_device``; nothing available."""
+    fake_settings = SimpleNamespace(device="")
+    fake_torch = SimpleNamespace(
+        backends=SimpleNamespace(mps=SimpleNamespace(is_available=lambda: False)),
+        cuda=SimpleNamespace(is_available=lambda: False),
+    )
+    monkeypatch.setattr("app.services.inference.settings", fake_settings)
+    monkeypatch.setattr("app.services.inference.torch", fake_torch)
+    return SimpleNamespace(settings=fake_settings, torch=fake_torch)
+
+
 class TestSelectDevice:
-    def test_explicit_override(self):
-        assert _select_device("cuda:1") == "cuda:1"
-
-    def test_settings_override(self):
-        with patch("app.services.inference.settings") as mock_settings:
-            mock_settings.device = "mps"
-            assert _select_device(None) == "mps"
-
-    def test_mps_available(self):
-        with (
-            patch("app.services.inference.settings") as mock_settings,
-            patch("app.services.inference.torch") as mock_torch,
-        ):
-            mock_settings.device = ""
-            mock_torch.backends.mps.is_available.return_value = True
-            assert _select_device(None) == "mps"
-
-    def test_cuda_available(self):
-        with (
-            patch("app.services.inference.settings") as mock_settings,
-            patch("app.services.inference.torch") as mock_torch,
-        ):
-            mock_settings.device = ""
-            mock_torch.backends.mps.is_available.return_value = False
-            mock_torch.cuda.is_available.return_value = True
-            assert _select_device(None) == "cuda"
-
-    def test_cpu_fallback(self):
-        with (
-            patch("app.services.inference.settings") as mock_settings,
-            patch("app.services.inference.torch") as mock_torch,
-        ):
-            mock_settings.device = ""
-            mock_torch.backends.mps.is_available.return_value = False
-            mock_torch.cuda.is_available.return_value = False
-            assert _select_device(None) == "cpu"
+    @pytest.mark.parametrize("requested,settings_device,mps,cuda,expected", [
+        pytest.param("cuda:1", "", False, False, "cuda:1", id="explicit-override"),
+        pytest.param(None, "mps", False, False, "mps", id="settings-override"),
+        pytest.param(None, "", True, False, "mps", id="mps-available"),
+        pytest.param(None, "", False, True, "cuda", id="cuda-available"),
+        pytest.param(None, "", False, False, "cpu", id="cpu-fallback"),
+    ])
+    def test_select_device(self, device_env, requested, settings_device, mps, cuda, expected):
+        device_env.settings.device = settings_device
+        device_env.torch.backends.mps.is_available = lambda: mps
+        device_env.torch.cuda.is_available = lambda: cuda
+        assert _select_device(requested) == expected
 
 
 # ═══════════════════════════════════════════════════════════════════
 # HoVerNetEngine — geometry helpers
 # ═══════════════════════════════════════════════════════════════════
-class TestGeometryHelpers:
-    """Test _polygon_area and _polygon_perimeter (static methods)."""
-
-    def test_polygon_area_triangle(self):
-        # Right triangle with legs 3 and 4 → area = 6
-        verts = np.array([[0, 0], [3, 0], [0, 4]], dtype=np.float64)
-        assert math.isclose(HoVerNetEngine._polygon_area(verts), 6.0, rel_tol=1e-9)
-
-    def test_polygon_area_square(self):
-        verts = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
-        assert math.isclose(HoVerNetEngine._polygon_area(verts), 100.0, rel_tol=1e-9)
-
-    def test_polygon_area_fewer_than_3(self):
-        assert HoVerNetEngine._polygon_area(np.array([[0, 0], [1, 1]])) == 0.0
+_TRI = np.array([[0, 0], [3, 0], [0, 4]], dtype=np.float64)  # right triangle, legs 3 and 4
+_SQUARE = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
+_SEGMENT = np.array([[0, 0], [1, 1]], dtype=np.float64)
+_POINT = np.array([[5, 5]], dtype=np.float64)
+_EMPTY = np.empty((0, 2), dtype=np.float64)
 
-    def test_polygon_area_single_point(self):
-        assert HoVerNetEngine._polygon_area(np.array([[5, 5]])) == 0.0
 
-    def test_polygon_area_empty(self):
-        assert HoVerNetEngine._polygon_area(np.array([])) == 0.0
-
-    def test_polygon_perimeter_square(self):
-        verts = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
-        assert math.isclose(HoVerNetEngine._polygon_perimeter(verts), 40.0, rel_tol=1e-9)
-
-    def test_polygon_perimeter_fewer_than_2(self):
-        assert HoVerNetEngine._polygon_perimeter(np.array([[0, 0]])) == 0.0
+class TestGeometryHelpers:
+    """Test _polygon_area and _polygon_perimeter (static methods)."""
 
-    def test_polygon_perimeter_empty(self):
-        assert HoVerNetEngine._polygon_perimeter(np.array([])) == 0.0
+    @pytest.mark.parametrize("verts,expected", [
+        pytest.param(_TRI, 6.0, id="triangle"),
+        pytest.param(_SQUARE, 100.0, id="square"),
+        pytest.param(_SEGMENT, 0.0, id="fewer-than-3"),
+        pytest.param(_POINT, 0.0, id="single-point"),
+        pytest.param(_EMPTY, 0.0, id="empty"),
+    ])
+    def test_polygon_area(self, verts, expected):
+        assert HoVerNetEngine._polygon_area(verts) == pytest.approx(expected, rel=1e-9)
+
+    @pytest.mark.parametrize("verts,expected", [
+        pytest.param(_SQUARE, 40.0, id="square"),
+        pytest.param(_POINT, 0.0, id="fewer-than-2"),
+        pytest.param(_EMPTY, 0.0, id="empty"),
+    ])
+    def test_polygon_perimeter(self, verts, expected):
+        assert HoVerNetEngine._polygon_perimeter(verts) == pytest.approx(expected, rel=1e-9)
 
 
 # ═══════════════════════════════════════════════════════════════════
 # HoVerNetEngine — _parse_raw_output
 # ═══════════════════════════════════════════════════════════════════
+# Raw ``inst_dict`` samples shared by the parsing and infer_tile tests;
+# ``_parse_raw_output`` only reads them (contours are copied into arrays).
+_INST_SINGLE = {
+    1: {
+        "centroid": [50.0, 60.0],
+        "contour": [[40, 50], [60, 50], [60, 70], [40, 70]],
+        "type": 1,
+        "prob": 0.95,
+    },
+}
+_INST_UNKNOWN_TYPE = {
+    0: {
+        "centroid": [10.0, 10.0],
+        "contour": [[0, 0], [20, 0], [20, 20], [0, 20]],
+        "type": 99,
+        "prob": 0.5,
+    },
+}
+_INST_MULTI = {
+    1: {"centroid": [10.0, 10.0], "contour": [[5, 5], [15, 5], [15, 15]], "type": 1, "prob": 0.9},
+    2: {"centroid": [80.0, 80.0], "contour": [[75, 75], [85, 75], [85, 85]], "type": 2, "prob": 0.8},
+    3: {"centroid": [50.0, 50.0], "contour": [[45, 45], [55, 45], [55, 55]], "type": 0, "prob": 0.7},
+}
+
+
+_PARSE_CASES = [
+    pytest.param({}, (0, 0), {"count": 0, "tile_x": 0, "tile_w": 256}, {}, id="empty"),
+    pytest.param(
+        _INST_SINGLE, (100, 200), {"count": 1},
+        {
+            "centroid_x": 150.0,  # 50 + 100
+            "centroid_y": 260.0,  # 60 + 200
+            "cell_type": 1,
+            "cell_type_name": "Neoplastic",
+            "probability": 0.95,
+            "contour": [[140, 250], [160, 250], [160, 270], [140, 270]],  # offset
+        },
+        id="single-nucleus",
+    ),
+    pytest.param(_INST_UNKNOWN_TYPE, (0, 0), {"count": 1}, {"cell_type_name": "Unknown"}, id="unknown-type"),
+    pytest.param(
+        {0: {"centroid": [10.0, 10.0], "contour": [[0, 0], [10, 0], [10, 10]]}},
+        (0, 0), {"count": 1}, {"cell_type": 0, "probability": 0.0},
+        id="missing-type-defaults-to-zero",
+    ),
+    pytest.param(
+        # 10x10 square → 100 px² * 0.25² = 6.25 μm²; 40 px * 0.25 = 10 μm
+        {0: {"centroid": [5.0, 5.0], "contour": [[0, 0], [10, 0], [10, 10], [0, 10]], "type": 1, "prob": 0.9}},
+        (0, 0), {"count": 1}, {"area_um2": 6.25, "perimeter_um": 10.0},
+        id="morphometrics",
+    ),
+    pytest.param(_INST_MULTI, (0, 0), {"count": 3}, {}, id="multiple-nuclei"),
+]
+
+
 class TestParseRawOutput:
     """Test the raw output parsing without loading TIAToolbox."""
 
-    @pytest.fixture()
-    def engine(self):
-        """Create engine without loading model (skip TIAToolbox)."""
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            eng = HoVerNetEngine(device="cpu")
-        return eng
-
-    def test_empty_dict(self, engine):
-        result = engine._parse_raw_output({}, 0, 0, 0.25, 256, 256)
-        assert result.count == 0
-        assert result.tile_x == 0
-        assert result.tile_w == 256
-
-    def test_single_nucleus(self, engine):
-        raw = {
-            0: {
-                "centroid": [50.0, 60.0],
-                "contour": [[40, 50], [60, 50], [60, 70], [40, 70]],
-                "type": 1,
-                "prob": 0.95,
-            },
-        }
-        result = engine._parse_raw_output(raw, offset_x=100, offset_y=200, mpp=0.25, tile_h=256, tile_w=256)
-        assert result.count == 1
-        nuc = result.nuclei[0]
-        assert nuc.centroid_x == 150.0  # 50 + 100
-        assert nuc.centroid_y == 260.0  # 60 + 200
-        assert nuc.cell_type == 1
-        assert nuc.cell_type_name == "Neoplastic"
-        assert nuc.probability == 0.95
-        # Contour should be offset
-        assert nuc.contour[0, 0] == 140.0  # 40 + 100
-        assert nuc.contour[0, 1] == 250.0  # 50 + 200
-
-    def test_unknown_cell_type(self, engine):
-        raw = {
-            0: {
-                "centroid": [10.0, 10.0],
-                "contour": [[0, 0], [20, 0], [20, 20], [0, 20]],
-                "type": 99,
-                "prob": 0.5,
-            },
-        }
-        result = engine._parse_raw_output(raw, 0, 0, 0.25, 256, 256)
-        assert result.nuclei[0].cell_type_name == "Unknown"
-
-    def test_missing_type_defaults_to_zero(self, engine):
-        raw = {
-            0: {
-                "centroid": [10.0, 10.0],
-                "contour": [[0, 0], [10, 0], [10, 10]],
-            },
-        }
-        result = engine._parse_raw_output(raw, 0, 0, 0.25, 256, 256)
-        assert result.nuclei[0].cell_type == 0
-        assert result.nuclei[0].probability == 0.0
-
-    def test_morphometrics_computed(self, engine):
-        """Verify area_um2 and perimeter_um are computed from contour."""
-        # 10x10 square → area=100px² → 100 * 0.0625 = 6.25 μm²
-        raw = {
-            0: {
-                "centroid": [5.0, 5.0],
-                "contour": [[0, 0], [10, 0], [10, 10], [0, 10]],
-                "type": 1,
-                "prob": 0.9,
-            },
-        }
-        result = engine._parse_raw_output(raw, 0, 0, 0.25, 256, 256)
-        nuc = result.nuclei[0]
-        assert nuc.area_um2 > 0
-        assert nuc.perimeter_um > 0
-
-    def test_multiple_nuclei(self, engine):
-        raw = {
-            0: {
-                "centroid": [10.0, 10.0],
-                "contour": [[0, 0], [20, 0], [20, 20]],
-                "type": 1,
-                "prob": 0.9,
-            },
-            1: {
-                "centroid": [50.0, 50.0],
-                "contour": [[40, 40], [60, 40], [60, 60]],
-                "type": 2,
-                "prob": 0.8,
-            },
-        }
-        result = engine._parse_raw_output(raw, 0, 0, 0.25, 256, 256)
-        assert result.count == 2
+    @pytest.mark.parametrize("raw,offset,expected,expected_nucleus", _PARSE_CASES)
+    def test_parse(self, engine, raw, offset, expected, expected_nucleus):
+        result = engine._parse_raw_output(raw, *offset, 0.25, 256, 256)
+        for name, value in expected.items():
+            assert getattr(result, name) == value, name
+        for name, value in expected_nucleus.items():
+            np.testing.assert_array_equal(getattr(result.nuclei[0], name), value, err_msg=name)
 
 
 # ═══════════════════════════════════════════════════════════════════
 # HoVerNetEngine — ensure_loaded / load_model
 # ═══════════════════════════════════════════════════════════════════
+@pytest.mark.usefixtures("cpu_device")
 class TestEngineLoading:
     def test_ensure_loaded_calls_load_model(self):
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            eng = HoVerNetEngine(device="cpu")
-        eng.load_model = MagicMock()
+        eng = HoVerNetEngine(device="cpu")
+        calls = [0]
+        eng.load_model = lambda: calls.__setitem__(0, calls[0] + 1)
         eng.ensure_loaded()
-        eng.load_model.assert_called_once()
+        assert calls == [1]
 
     def test_ensure_loaded_skips_when_loaded(self):
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            eng = HoVerNetEngine(device="cpu")
+        eng = HoVerNetEngine(device="cpu")
         eng._loaded = True
-        eng.load_model = MagicMock()
+        calls = [0]
+        eng.load_model = lambda: calls.__setitem__(0, calls[0] + 1)
         eng.ensure_loaded()
-        eng.load_model.assert_not_called()
+        assert calls == [0]
 
 
 # ═══════════════════════════════════════════════════════════════════
 # Singleton — get_inference_engine
 # ═══════════════════════════════════════════════════════════════════
+@pytest.fixture()
+def no_engine_singleton():
+    """Clear the cached engine before and after each singleton test."""
+    _inference_mod._engine_instance = None
+    yield
+    _inference_mod._engine_instance = None
+
+
+@pytest.mark.usefixtures("cpu_device", "no_engine_singleton")
 class TestGetInferenceEngine:
     def test_returns_engine(self):
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            import app.services.inference as mod
-            mod._engine_instance = None
-            eng = mod.get_inference_engine()
-            assert isinstance(eng, HoVerNetEngine)
+        eng = _inference_mod.get_inference_engine()
+        assert isinstance(eng, HoVerNetEngine)
 
     def test_singleton(self):
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            import app.services.inference as mod
-            mod._engine_instance = None
-            e1 = mod.get_inference_engine()
-            e2 = mod.get_inference_engine()
-            assert e1 is e2
-            # Clean up
-            mod._engine_instance = None
+        e1 = _inference_mod.get_inference_engine()
+        e2 = _inference_mod.get_inference_engine()
+        assert e1 is e2
 
 
 # ═══════════════════════════════════════════════════════════════════
 # HoVerNetEngine.infer_batch
 # ═══════════════════════════════════════════════════════════════════
+@pytest.mark.usefixtures("cpu_device")
 class TestInferBatch:
     def test_infer_batch_delegates_to_infer_tile(self):
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            eng = HoVerNetEngine(device="cpu")
+        eng = HoVerNetEngine(device="cpu")
 
         fake_result = InferenceResult(nuclei=[], tile_x=0, tile_y=0, tile_w=10, tile_h=10)
-        eng.infer_tile = MagicMock(return_value=fake_result)
+        calls = []
+        eng.infer_tile = lambda tile, ox, oy, mpp, **k: (calls.append((ox, oy)), fake_result)[1]
 
-        tiles = [np.zeros((64, 64, 3), dtype=np.uint8)] * 3
+        tiles = [np.broadcast_to(np.uint8(0), (64, 64, 3))] * 3
         offsets = [(0, 0), (64, 0), (128, 0)]
         results = eng.infer_batch(tiles, offsets, mpp=0.25)
 
-        assert len(results) == 3
-        assert eng.infer_tile.call_count == 3
+        assert results == [fake_result] * 3
+        assert calls == offsets
 
 
 # ═══════════════════════════════════════════════════════════════════
 # HoVerNetEngine.load_model (real TIAToolbox path — fully mocked)
 # ═══════════════════════════════════════════════════════════════════
+class _Counter:
+    """Callable that only counts calls and keeps the last arguments."""
+
+    __slots__ = ("calls", "last_args", "ret")
+
+    def __init__(self, ret: Any = None) -> None:
+        self.calls = 0
+        self.last_args: tuple | None = None
+        self.ret = ret
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        self.calls += 1
+        self.last_args = (args, kwargs)
+        return self.ret
+
+
+@pytest.fixture()
+def pretrained() -> MagicMock:
+    """The conftest's stub ``get_pretrained_model``, reset for each test."""
+    mock = sys.modules["tiatoolbox.models.architecture"].get_pretrained_model
+    mock.reset_mock(return_value=True, side_effect=True)
+    return mock
+
+
+@pytest.mark.usefixtures("cpu_device")
 class TestLoadModel:
-    def test_load_model_success(self):
+    def test_load_model_success(self, pretrained):
         """Ensure load_model calls get_pretrained_model and sets flags."""
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            eng = HoVerNetEngine(device="cpu")
-
-        mock_model = MagicMock()
-        mock_model.to.return_value = mock_model
-        mock_ioconfig = MagicMock()
-        mock_ioconfig.patch_input_shape = [256, 256]
-        mock_ioconfig.patch_output_shape = [164, 164]
-
-        with patch.dict("sys.modules", {"tiatoolbox": MagicMock(), "tiatoolbox.models": MagicMock(), "tiatoolbox.models.architecture": MagicMock()}):
-            with patch("tiatoolbox.models.architecture.get_pretrained_model", return_value=(mock_model, mock_ioconfig), create=True):
-                # We need to mock the import inside load_model
-                import sys
-                mock_arch = MagicMock()
-                mock_arch.get_pretrained_model.return_value = (mock_model, mock_ioconfig)
-                sys.modules["tiatoolbox.models.architecture"] = mock_arch
-
-                eng.load_model()
-
-                assert eng._loaded is True
-                assert eng._model is mock_model
-                assert eng._ioconfig is mock_ioconfig
-                mock_model.to.assert_called_once_with("cpu")
-                mock_model.eval.assert_called_once()
-
-                # Clean up
-                del sys.modules["tiatoolbox.models.architecture"]
-
-    def test_load_model_failure(self):
-        """Ensure load_model re-raises on error."""
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            eng = HoVerNetEngine(device="cpu")
+        eng = HoVerNetEngine(device="cpu")
+
+        mock_model = SimpleNamespace(eval=_Counter())
+        mock_model.to = _Counter(ret=mock_model)
+        mock_ioconfig = SimpleNamespace(patch_input_shape=[256, 256], patch_output_shape=[164, 164])
+        pretrained.return_value = (mock_model, mock_ioconfig)
+
+        eng.load_model()
 
-        import sys
-        mock_arch = MagicMock()
-        mock_arch.get_pretrained_model.side_effect = RuntimeError("download failed")
-        sys.modules["tiatoolbox.models.architecture"] = mock_arch
+        assert eng._loaded is True
+        assert eng._model is mock_model
+        assert eng._ioconfig is mock_ioconfig
+        pretrained.assert_called_once()
+        assert mock_model.to.calls == 1
+        assert mock_model.to.last_args == (("cpu",), {})
+        assert mock_model.eval.calls == 1
+
+    def test_load_model_failure(self, pretrained):
+        """Ensure load_model re-raises on error."""
+        eng = HoVerNetEngine(device="cpu")
+        pretrained.side_effect = RuntimeError("download failed")
 
         with pytest.raises(RuntimeError, match="download failed"):
             eng.load_model()
 
         assert eng._loaded is False
-        del sys.modules["tiatoolbox.models.architecture"]
 
 
 # ═══════════════════════════════════════════════════════════════════
 # HoVerNetEngine.infer_tile (full pipeline — mocked model)
 # ═══════════════════════════════════════════════════════════════════
-class TestInferTile:
-    """Test the complete infer_tile pipeline with a mocked TIAToolbox model."""
+# The mocked model never looks at pixel values, so tiles are zero-stride
+# read-only views of a single zero byte (nothing is allocated).
+def _tile(h: int, w: int) -> np.ndarray:
+    return np.broadcast_to(np.uint8(0), (h, w, 3))
 
-    @pytest.fixture()
-    def loaded_engine(self):
-        """Create an engine with a mock model already loaded."""
-        with patch("app.services.inference._select_device", return_value="cpu"):
-            eng = HoVerNetEngine(device="cpu")
 
-        mock_model = MagicMock()
-        mock_ioconfig = MagicMock()
-        mock_ioconfig.patch_input_shape = [256, 256]
-        mock_ioconfig.patch_output_shape = [164, 164]
+# Zeroed fp32 model heads (HoVerNet's output dtype), sized for the
+# largest batch a test runs (``infer_settings`` pins ``batch_size`` to 4);
+# batches take a leading slice.
+_MAX_BATCH = 4
+_NP = np.zeros((_MAX_BATCH, 164, 164, 2), dtype=np.float32)
+_HV = np.zeros((_MAX_BATCH, 164, 164, 2), dtype=np.float32)
+_TP = np.zeros((_MAX_BATCH, 164, 164, 6), dtype=np.float32)
+for _head in (_NP, _HV, _TP):
+    _head.setflags(write=False)
+_HEADS_1 = (_NP[:1], _HV[:1], _TP[:1])
+
+
+def _heads(n: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return _NP[:n], _HV[:n], _TP[:n]
+
+
+_INST_MAP = np.zeros((164, 164), dtype=np.int32)
+_INST_MAP.setflags(write=False)
+
+
+def _stub_model(*, inst_dict=None, infer_batch=None) -> SimpleNamespace:
+    """Plain-callable stand-in for the TIAToolbox model.
+
+    ``infer_batch`` defaults to one zeroed patch; ``postproc`` returns
+    *inst_dict* (empty by default) for every patch.
+    """
+    inst = {} if inst_dict is None else inst_dict
+    return SimpleNamespace(
+        infer_batch=infer_batch or (lambda *a, **k: _HEADS_1),
+        postproc=lambda single: (_INST_MAP, inst),
+    )
 
-        eng._model = mock_model
-        eng._ioconfig = mock_ioconfig
-        eng._loaded = True
-        return eng
+
+@pytest.fixture(scope="class")
+def infer_settings():
+    """Pin the ``settings`` read by ``infer_tile`` once for the whole class."""
+    fake = SimpleNamespace(
+        batch_size=4,
+        cell_type_map={0: "Background", 1: "Neoplastic", 2: "Inflammatory"},
+    )
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.services.inference.settings", fake)
+        yield fake
+
+
+@pytest.mark.usefixtures("infer_settings")
+class TestInferTile:
+    """Test the complete infer_tile pipeline with a mocked TIAToolbox model."""
 
     def test_small_tile_single_patch(self, loaded_engine):
         """A tile smaller than patch_output_shape produces 1 patch."""
         eng = loaded_engine
-        tile = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
-
-        # Mock model.infer_batch to return 3 heads with correct shapes
-        # Each head: (N, H_out, W_out, C) — but we only need per-patch slicing
-        np_map = np.zeros((1, 164, 164, 2))
-        hv_map = np.zeros((1, 164, 164, 2))
-        tp_map = np.zeros((1, 164, 164, 6))
-        eng._model.infer_batch.return_value = (np_map, hv_map, tp_map)
-
-        # Mock postproc to return a small inst_dict with one nucleus
-        inst_map = np.zeros((164, 164), dtype=np.int32)
-        inst_dict = {
-            1: {
-                "centroid": [50.0, 60.0],
-                "contour": [[40, 50], [60, 50], [60, 70], [40, 70]],
-                "type": 1,
-                "prob": 0.95,
-            }
-        }
-        eng._model.postproc.return_value = (inst_map, inst_dict)
+        tile = _tile(100, 100)
+
+        # infer_batch returns 3 heads (N, H_out, W_out, C) — only per-patch
+        # slicing matters; postproc returns one nucleus.
+        eng._model = _stub_model(inst_dict=_INST_SINGLE)
 
         result = eng.infer_tile(tile, offset_x=100, offset_y=200, mpp=0.25)
 
@@ -435,25 +452,17 @@ class TestInferTile:
     def test_large_tile_multiple_batches(self, loaded_engine):
         """A tile large enough to produce multiple batches."""
         eng = loaded_engine
-        # 500x500 tile with stride=164 → ceil(500/164)^2 = 16 patches → 2+ batches with batch_size=6
-        tile = np.random.randint(0, 255, (500, 500, 3), dtype=np.uint8)
+        # 500x500 tile with stride=164 → ceil(500/164)^2 = 16 patches → 4 batches with batch_size=4
+        tile = _tile(500, 500)
 
         # Mock: return empty inst_dict for all patches
         def fake_infer_batch(model, batch_tensor, device):
             n = batch_tensor.shape[0]
-            return (
-                np.zeros((n, 164, 164, 2)),
-                np.zeros((n, 164, 164, 2)),
-                np.zeros((n, 164, 164, 6)),
-            )
+            return _heads(n)
 
-        eng._model.infer_batch.side_effect = fake_infer_batch
-        eng._model.postproc.return_value = (np.zeros((164, 164)), {})
+        eng._model = _stub_model(infer_batch=fake_infer_batch)
 
-        with patch("app.services.inference.settings") as mock_settings:
-            mock_settings.batch_size = 4
-            mock_settings.cell_type_map = {0: "Background", 1: "Neoplastic"}
-            result = eng.infer_tile(tile, offset_x=0, offset_y=0, mpp=0.25)
+        result = eng.infer_tile(tile, offset_x=0, offset_y=0, mpp=0.25)
 
         assert isinstance(result, InferenceResult)
         assert result.count == 0  # No nuclei detected
@@ -462,81 +471,46 @@ class TestInferTile:
         """Patches at tile boundary are zero-padded."""
         eng = loaded_engine
         # Tile that doesn't evenly divide into patch_output strides
-        tile = np.random.randint(0, 255, (200, 200, 3), dtype=np.uint8)
+        tile = _tile(200, 200)
 
         def fake_infer_batch(model, batch_tensor, device):
             n = batch_tensor.shape[0]
             # Verify all patches are 256x256
             assert batch_tensor.shape[1] == 256
             assert batch_tensor.shape[2] == 256
-            return (
-                np.zeros((n, 164, 164, 2)),
-                np.zeros((n, 164, 164, 2)),
-                np.zeros((n, 164, 164, 6)),
-            )
+            return _heads(n)
 
-        eng._model.infer_batch.side_effect = fake_infer_batch
-        eng._model.postproc.return_value = (np.zeros((164, 164)), {})
+        eng._model = _stub_model(infer_batch=fake_infer_batch)
 
         result = eng.infer_tile(tile, offset_x=0, offset_y=0, mpp=0.25)
         assert isinstance(result, InferenceResult)
 
-    def test_progress_callback(self, loaded_engine):
-        """Progress callback should be called for each batch."""
+    @pytest.mark.parametrize("cb", [None, "record"])
+    def test_progress_callback(self, loaded_engine, cb):
+        """Progress is reported once per batch; a None callback is fine too."""
         eng = loaded_engine
-        tile = np.random.randint(0, 255, (164, 164, 3), dtype=np.uint8)
+        tile = _tile(164, 164)
 
-        eng._model.infer_batch.return_value = (
-            np.zeros((1, 164, 164, 2)),
-            np.zeros((1, 164, 164, 2)),
-            np.zeros((1, 164, 164, 6)),
-        )
-        eng._model.postproc.return_value = (np.zeros((164, 164)), {})
+        eng._model = _stub_model()
 
         callback_calls = []
-
-        def progress_fn(current, total, message):
-            callback_calls.append((current, total, message))
+        progress_fn = (lambda *call: callback_calls.append(call)) if cb == "record" else None
 
         result = eng.infer_tile(tile, offset_x=0, offset_y=0, mpp=0.25, progress_callback=progress_fn)
 
-        # Should be called at start (0, N) and then once per batch (1, N)
-        assert len(callback_calls) >= 2
-        assert callback_calls[0][0] == 0  # Initial call
-        assert callback_calls[-1][0] == callback_calls[-1][1]  # Final call, current == total
-
-    def test_no_progress_callback(self, loaded_engine):
-        """Inference should work fine without a progress callback."""
-        eng = loaded_engine
-        tile = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
-
-        eng._model.infer_batch.return_value = (
-            np.zeros((1, 164, 164, 2)),
-            np.zeros((1, 164, 164, 2)),
-            np.zeros((1, 164, 164, 6)),
-        )
-        eng._model.postproc.return_value = (np.zeros((164, 164)), {})
-
-        result = eng.infer_tile(tile, offset_x=0, offset_y=0, mpp=0.25, progress_callback=None)
         assert isinstance(result, InferenceResult)
+        if cb == "record":
+            # Called at start (0, N) and then once per batch (1, N)
+            assert len(callback_calls) >= 2
+            assert callback_calls[0][0] == 0  # Initial call
+            assert callback_calls[-1][0] == callback_calls[-1][1]  # Final call, current == total
 
     def test_multiple_nuclei_across_patches(self, loaded_engine):
         """Multiple nuclei from different patches are merged correctly."""
         eng = loaded_engine
-        tile = np.random.randint(0, 255, (164, 164, 3), dtype=np.uint8)
-
-        eng._model.infer_batch.return_value = (
-            np.zeros((1, 164, 164, 2)),
-            np.zeros((1, 164, 164, 2)),
-            np.zeros((1, 164, 164, 6)),
-        )
+        tile = _tile(164, 164)
 
-        inst_dict = {
-            1: {"centroid": [10.0, 10.0], "contour": [[5, 5], [15, 5], [15, 15]], "type": 1, "prob": 0.9},
-            2: {"centroid": [80.0, 80.0], "contour": [[75, 75], [85, 75], [85, 85]], "type": 2, "prob": 0.8},
-            3: {"centroid": [50.0, 50.0], "contour": [[45, 45], [55, 45], [55, 55]], "type": 0, "prob": 0.7},
-        }
-        eng._model.postproc.return_value = (np.zeros((164, 164)), inst_dict)
+        eng._model = _stub_model(inst_dict=_INST_MULTI)
 
         result = eng.infer_tile(tile, offset_x=1000, offset_y=2000, mpp=0.5)
         assert result.count == 3
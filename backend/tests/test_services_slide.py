@@ -4,13 +4,14 @@ caching, and DZI generation.
 """
 from __future__ import annotations
 
-import io
 import threading
 from pathlib import Path
+from types import MappingProxyType
 from unittest.mock import MagicMock, PropertyMock, patch, call
 
 import numpy as np
 import pytest
+from openslide import OpenSlide
 from PIL import Image
 
 from app.services.slide import (
@@ -23,15 +24,26 @@ from app.services.slide import (
 )
 
 
+@pytest.fixture(autouse=True)
+def _reset_tls():
+    """Start and end every test with no thread-local handles and no cached services."""
+    def clear():
+        for name in ("slides", "dzgens"):
+            if hasattr(_tls, name):
+                delattr(_tls, name)
+        get_slide_service.cache_clear()
+
+    clear()
+    yield
+    clear()
+
+
 # ═══════════════════════════════════════════════════════════════════
 # Thread-local helpers
 # ═══════════════════════════════════════════════════════════════════
 class TestTlsOpen:
     @patch("app.services.slide.OpenSlide")
     def test_creates_handle_on_first_call(self, mock_os_cls):
-        # Clear TLS state
-        if hasattr(_tls, "slides"):
-            del _tls.slides
         mock_handle = MagicMock()
         mock_os_cls.return_value = mock_handle
 
@@ -39,13 +51,8 @@ class TestTlsOpen:
         assert result is mock_handle
         mock_os_cls.assert_called_once_with("/fake/slide.svs")
 
-        # Clean up
-        del _tls.slides
-
     @patch("app.services.slide.OpenSlide")
     def test_caches_handle(self, mock_os_cls):
-        if hasattr(_tls, "slides"):
-            del _tls.slides
         mock_handle = MagicMock()
         mock_os_cls.return_value = mock_handle
 
@@ -54,18 +61,11 @@ class TestTlsOpen:
         assert r1 is r2
         assert mock_os_cls.call_count == 1
 
-        del _tls.slides
-
 
 class TestTlsDz:
     @patch("app.services.slide.DeepZoomGenerator")
     @patch("app.services.slide.OpenSlide")
     def test_creates_dz_on_first_call(self, mock_os_cls, mock_dz_cls):
-        if hasattr(_tls, "slides"):
-            del _tls.slides
-        if hasattr(_tls, "dzgens"):
-            del _tls.dzgens
-
         mock_handle = MagicMock()
         mock_os_cls.return_value = mock_handle
         mock_dz = MagicMock()
@@ -75,17 +75,9 @@ class TestTlsDz:
         assert result is mock_dz
         mock_dz_cls.assert_called_once()
 
-        del _tls.slides
-        del _tls.dzgens
-
     @patch("app.services.slide.DeepZoomGenerator")
     @patch("app.services.slide.OpenSlide")
     def test_caches_dz(self, mock_os_cls, mock_dz_cls):
-        if hasattr(_tls, "slides"):
-            del _tls.slides
-        if hasattr(_tls, "dzgens"):
-            del _tls.dzgens
-
         mock_handle = MagicMock()
         mock_os_cls.return_value = mock_handle
         mock_dz = MagicMock()
@@ -96,75 +88,136 @@ class TestTlsDz:
         assert r1 is r2
         assert mock_dz_cls.call_count == 1
 
-        del _tls.slides
-        del _tls.dzgens
-
 
 # ═══════════════════════════════════════════════════════════════════
 # SlideService
 # ═══════════════════════════════════════════════════════════════════
-class TestSlideService:
-    @pytest.fixture()
-    def mock_openslide(self):
-        """Patch OpenSlide for SlideService.__init__."""
-        with patch("app.services.slide.OpenSlide") as MockOS:
-            handle = MagicMock()
-            handle.dimensions = (50000, 40000)
-            handle.level_count = 5
-            handle.level_dimensions = (
-                (50000, 40000),
-                (25000, 20000),
-                (12500, 10000),
-                (6250, 5000),
-                (3125, 2500),
-            )
-            handle.properties = {
-                "openslide.mpp-x": "0.252",
-                "openslide.objective-power": "40",
-                "openslide.vendor": "aperio",
-            }
-            MockOS.return_value = handle
-            yield handle
+# Read-only, so the shared handle can expose it directly; tests that need
+# other properties assign a new dict to the handle instead.
+_DEFAULT_PROPS = MappingProxyType({
+    "openslide.mpp-x": "0.252",
+    "openslide.objective-power": "40",
+    "openslide.vendor": "aperio",
+})
+
+# Attributes re-seeded on the shared OpenSlide handle before every test;
+# tests that blank ``properties`` get the defaults back on the next one.
+_OPENSLIDE_DEFAULTS = {
+    "dimensions": (50000, 40000),
+    "level_count": 5,
+    "level_dimensions": (
+        (50000, 40000),
+        (25000, 20000),
+        (12500, 10000),
+        (6250, 5000),
+        (3125, 2500),
+    ),
+    "properties": _DEFAULT_PROPS,
+}
+
+
+@pytest.fixture(scope="module")
+def _openslide_handle():
+    """Patch OpenSlide once for the module; every call returns one handle."""
+    with patch("app.services.slide.OpenSlide") as MockOS:
+        handle = MagicMock()
+        MockOS.return_value = handle
+        yield handle
+
+
+@pytest.fixture()
+def mock_openslide(_openslide_handle):
+    """The shared OpenSlide handle, with call records and defaults reset."""
+    _openslide_handle.reset_mock()
+    for name, value in _OPENSLIDE_DEFAULTS.items():
+        setattr(_openslide_handle, name, value)
+    return _openslide_handle
+
+
+# Written by the mocked DZI tile's save(); get_dzi_tile only passes the bytes
+# through, so bare JPEG SOI/EOI markers stand in for an encoded image.
+_DZI_JPEG_BYTES = b"\xff\xd8\xff\xd9"
+
+# read_region results; SlideService only converts them, never mutates.
+_MOCK_IMG_100 = Image.new("RGBA", (100, 100), "white")
+_MOCK_IMG_50x40 = Image.new("RGBA", (50, 40), "white")
+
+
+_FAKE_SLIDE = Path("/fake/test.svs")
+
 
+class _FakeSlidePath(type(_FAKE_SLIDE)):
+    """``Path`` as seen by ``app.services.slide``: ``_FAKE_SLIDE`` exists."""
+
+    def exists(self, *args, **kwargs) -> bool:
+        return self == _FAKE_SLIDE or super().exists(*args, **kwargs)
+
+
+@pytest.fixture()
+def slide_path(monkeypatch) -> Path:
+    """A path SlideService accepts without touching the disk.
+
+    ``__init__`` only checks ``exists()``; the slide module's ``Path`` is
+    swapped for one that reports ``_FAKE_SLIDE`` as present.
+    """
+    monkeypatch.setattr("app.services.slide.Path", _FakeSlidePath)
+    return _FAKE_SLIDE
+
+
+@pytest.fixture()
+def svc(mock_openslide, slide_path) -> SlideService:
+    """SlideService over the mocked handle, for tests that skip init checks."""
+    return SlideService(slide_path)
+
+
+@pytest.fixture()
+def tls_dz(monkeypatch) -> MagicMock:
+    """Point ``_tls_dz`` at a DeepZoomGenerator mock and return it."""
+    dz = MagicMock()
+    monkeypatch.setattr("app.services.slide._tls_dz", lambda filepath: dz)
+    return dz
+
+
+@pytest.fixture(scope="class")
+def _tls_slide_handle() -> MagicMock:
+    """One OpenSlide-spec'd handle mock per class; ``tls_slide`` resets it."""
+    return MagicMock(spec=OpenSlide)
+
+
+@pytest.fixture()
+def tls_slide(monkeypatch, _tls_slide_handle) -> MagicMock:
+    """Point ``_tls_open`` at the shared handle mock and return it."""
+    _tls_slide_handle.reset_mock(return_value=True, side_effect=True)
+    monkeypatch.setattr("app.services.slide._tls_open", lambda filepath: _tls_slide_handle)
+    return _tls_slide_handle
+
+
+class TestSlideService:
     def test_init_file_not_found(self):
         with pytest.raises(FileNotFoundError, match="WSI not found"):
             SlideService("/nonexistent/path.svs")
 
-    def test_init_extracts_metadata(self, mock_openslide, tmp_path):
-        # Create a dummy file
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-
-        svc = SlideService(slide_file)
+    def test_init_extracts_metadata(self, mock_openslide, slide_path):
+        svc = SlideService(slide_path)
         assert svc.dimensions == (50000, 40000)
         assert svc.level_count == 5
         assert len(svc.level_dimensions) == 5
         assert "openslide.vendor" in svc.properties
 
-    def test_init_closes_handle(self, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        SlideService(slide_file)
+    def test_init_closes_handle(self, mock_openslide, slide_path):
+        SlideService(slide_path)
         mock_openslide.close.assert_called_once()
 
-    def test_mpp_from_metadata(self, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
+    def test_mpp_from_metadata(self, svc):
         assert svc.mpp == 0.252
 
-    def test_mpp_falls_back_to_default(self, mock_openslide, tmp_path):
+    def test_mpp_falls_back_to_default(self, mock_openslide, slide_path):
         mock_openslide.properties = {}
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
+        svc = SlideService(slide_path)
         # Should use settings.default_mpp (0.25)
         assert svc.mpp == 0.25
 
-    def test_slide_info(self, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
+    def test_slide_info(self, svc):
         info = svc.slide_info()
         assert info["filename"] == "test.svs"
         assert info["width_px"] == 50000
@@ -176,151 +229,66 @@ class TestSlideService:
         assert info["magnification"] == "40"
         assert info["vendor"] == "aperio"
 
-    def test_slide_info_unknown_magnification(self, mock_openslide, tmp_path):
+    def test_slide_info_unknown_magnification(self, mock_openslide, slide_path):
         mock_openslide.properties = {}
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
+        svc = SlideService(slide_path)
         info = svc.slide_info()
         assert info["magnification"] == "unknown"
         assert info["vendor"] == "unknown"
 
     # ── DZI methods ───────────────────────────────────────────
 
-    @patch("app.services.slide._tls_dz")
-    def test_get_dzi_xml(self, mock_dz_fn, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        mock_dz = MagicMock()
-        mock_dz.get_dzi.return_value = '<Image TileSize="254"/>'
-        mock_dz_fn.return_value = mock_dz
+    def test_get_dzi_xml(self, tls_dz, svc):
+        tls_dz.get_dzi.return_value = '<Image TileSize="254"/>'
 
         xml = svc.get_dzi_xml()
         assert "TileSize" in xml
 
-    @patch("app.services.slide._tls_dz")
-    def test_get_dzi_tile(self, mock_dz_fn, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        # Create a real small JPEG
-        img = Image.new("RGB", (10, 10), color="red")
-        buf = io.BytesIO()
-        img.save(buf, "JPEG")
-        expected_bytes = buf.getvalue()
-
+    def test_get_dzi_tile(self, tls_dz, svc):
         mock_tile = MagicMock(spec=Image.Image)
-        mock_tile.save = MagicMock(side_effect=lambda b, **kw: b.write(expected_bytes))
-
-        mock_dz = MagicMock()
-        mock_dz.get_tile.return_value = mock_tile
-        mock_dz_fn.return_value = mock_dz
+        mock_tile.save = MagicMock(side_effect=lambda b, **kw: b.write(_DZI_JPEG_BYTES))
+        tls_dz.get_tile.return_value = mock_tile
 
         result = svc.get_dzi_tile(level=12, col=5, row=3)
-        assert isinstance(result, bytes)
-
-    @patch("app.services.slide._tls_dz")
-    def test_dzi_level_count(self, mock_dz_fn, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        mock_dz = MagicMock()
-        mock_dz.level_count = 15
-        mock_dz_fn.return_value = mock_dz
+        assert result == _DZI_JPEG_BYTES
 
-        assert svc.dzi_level_count == 15
+    @pytest.mark.parametrize("attr,value", [("level_count", 15), ("tile_count", 1000)])
+    def test_dzi_property(self, tls_dz, attr, value, svc):
+        setattr(tls_dz, attr, value)
 
-    @patch("app.services.slide._tls_dz")
-    def test_dzi_tile_count(self, mock_dz_fn, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        mock_dz = MagicMock()
-        mock_dz.tile_count = 1000
-        mock_dz_fn.return_value = mock_dz
-
-        assert svc.dzi_tile_count == 1000
+        assert getattr(svc, f"dzi_{attr}") == value
 
     # ── read_region_l0 ────────────────────────────────────────
 
-    @patch("app.services.slide._tls_open")
-    def test_read_region_l0(self, mock_open_fn, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        mock_slide = MagicMock()
-        mock_img = Image.new("RGBA", (100, 100), "white")
-        mock_slide.read_region.return_value = mock_img
-        mock_open_fn.return_value = mock_slide
-
-        arr = svc.read_region_l0(x=0, y=0, width=100, height=100)
+    @pytest.mark.parametrize("x,y,w,h,img,exc", [
+        pytest.param(0, 0, 100, 100, _MOCK_IMG_100, None, id="in-bounds"),
+        # Beyond the 50000x40000 slide bounds — clamped, still returns an array
+        pytest.param(49990, 39990, 100, 100, _MOCK_IMG_50x40, None, id="clamps"),
+        pytest.param(0, 0, -1, 100, None, ValueError, id="negative-width"),
+        pytest.param(0, 0, 100, 0, None, ValueError, id="zero-height"),
+    ])
+    def test_read_region_l0_matrix(self, tls_slide, svc, x, y, w, h, img, exc):
+        if exc is not None:
+            with pytest.raises(exc, match="Invalid region dimensions"):
+                svc.read_region_l0(x=x, y=y, width=w, height=h)
+            return
+
+        tls_slide.read_region.return_value = img
+        arr = svc.read_region_l0(x=x, y=y, width=w, height=h)
         assert isinstance(arr, np.ndarray)
-        assert arr.shape == (100, 100, 3)
-
-    @patch("app.services.slide._tls_open")
-    def test_read_region_l0_clamps(self, mock_open_fn, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        mock_slide = MagicMock()
-        mock_img = Image.new("RGBA", (50, 40), "white")
-        mock_slide.read_region.return_value = mock_img
-        mock_open_fn.return_value = mock_slide
-
-        # Request beyond slide bounds (50000x40000)
-        arr = svc.read_region_l0(x=49990, y=39990, width=100, height=100)
-        # Should clamp and still return an array
-        assert isinstance(arr, np.ndarray)
-
-    @patch("app.services.slide._tls_open")
-    def test_read_region_l0_negative_dimensions(self, mock_open_fn, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        mock_slide = MagicMock()
-        mock_open_fn.return_value = mock_slide
-
-        with pytest.raises(ValueError, match="Invalid region dimensions"):
-            svc.read_region_l0(x=0, y=0, width=-1, height=100)
-
-    @patch("app.services.slide._tls_open")
-    def test_read_region_l0_zero_height(self, mock_open_fn, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        mock_slide = MagicMock()
-        mock_open_fn.return_value = mock_slide
-
-        with pytest.raises(ValueError, match="Invalid region dimensions"):
-            svc.read_region_l0(x=0, y=0, width=100, height=0)
+        assert arr.shape == (img.height, img.width, 3)
 
     # ── close / context manager ───────────────────────────────
 
-    def test_context_manager(self, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        with SlideService(slide_file) as svc:
-            assert svc.dimensions == (50000, 40000)
-
-    def test_close_cleans_tls(self, mock_openslide, tmp_path):
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
+    def test_context_manager(self, svc):
+        with svc as entered:
+            assert entered is svc
+            assert entered.dimensions == (50000, 40000)
 
+    def test_close_cleans_tls(self, svc):
         # Pre-populate TLS
-        if not hasattr(_tls, "slides"):
-            _tls.slides = {}
-        if not hasattr(_tls, "dzgens"):
-            _tls.dzgens = {}
+        _tls.slides = {}
+        _tls.dzgens = {}
 
         mock_handle = MagicMock()
         _tls.slides[svc._filepath_str] = mock_handle
@@ -331,38 +299,19 @@ class TestSlideService:
         assert svc._filepath_str not in _tls.dzgens
         mock_handle.close.assert_called_once()
 
-    def test_close_no_tls_state(self, mock_openslide, tmp_path):
+    def test_close_no_tls_state(self, svc):
         """close() when TLS has no slides/dzgens attrs at all."""
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        # Ensure _tls has no attributes
-        if hasattr(_tls, "slides"):
-            del _tls.slides
-        if hasattr(_tls, "dzgens"):
-            del _tls.dzgens
-
         svc.close()  # Should not raise
 
-    def test_close_handle_not_in_tls(self, mock_openslide, tmp_path):
+    def test_close_handle_not_in_tls(self, svc):
         """close() when TLS has slides dict but this path isn't in it."""
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
-
-        if not hasattr(_tls, "slides"):
-            _tls.slides = {}
-        if not hasattr(_tls, "dzgens"):
-            _tls.dzgens = {}
+        _tls.slides = {}
+        _tls.dzgens = {}
         # Don't add the filepath to _tls.slides — pop returns None
         svc.close()  # Should not raise
 
-    def test_exit_calls_close(self, mock_openslide, tmp_path):
+    def test_exit_calls_close(self, svc):
         """__exit__ delegates to close()."""
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-        svc = SlideService(slide_file)
         svc.close = MagicMock()
         svc.__exit__(None, None, None)
         svc.close.assert_called_once()
@@ -373,11 +322,7 @@ class TestSlideService:
 # ═══════════════════════════════════════════════════════════════════
 class TestSlideServiceFactory:
     @patch("app.services.slide.OpenSlide")
-    def test_get_slide_service_caches(self, mock_os_cls, tmp_path):
-        get_slide_service.cache_clear()
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-
+    def test_get_slide_service_caches(self, mock_os_cls, slide_path):
         handle = MagicMock()
         handle.dimensions = (1000, 1000)
         handle.level_count = 1
@@ -385,17 +330,12 @@ class TestSlideServiceFactory:
         handle.properties = {}
         mock_os_cls.return_value = handle
 
-        s1 = get_slide_service(str(slide_file))
-        s2 = get_slide_service(str(slide_file))
+        s1 = get_slide_service(str(slide_path))
+        s2 = get_slide_service(str(slide_path))
         assert s1 is s2
-        get_slide_service.cache_clear()
 
     @patch("app.services.slide.OpenSlide")
-    def test_invalidate_clears_cache(self, mock_os_cls, tmp_path):
-        get_slide_service.cache_clear()
-        slide_file = tmp_path / "test.svs"
-        slide_file.touch()
-
+    def test_invalidate_clears_cache(self, mock_os_cls, slide_path):
         handle = MagicMock()
         handle.dimensions = (1000, 1000)
         handle.level_count = 1
@@ -403,62 +343,32 @@ class TestSlideServiceFactory:
         handle.properties = {}
         mock_os_cls.return_value = handle
 
-        s1 = get_slide_service(str(slide_file))
-        invalidate_slide_service(str(slide_file))
-        s2 = get_slide_service(str(slide_file))
+        s1 = get_slide_service(str(slide_path))
+        invalidate_slide_service(str(slide_path))
+        s2 = get_slide_service(str(slide_path))
         assert s1 is not s2
-        get_slide_service.cache_clear()
-
-    def test_invalidate_closes_tls_handles(self, tmp_path):
-        filepath = str(tmp_path / "test.svs")
-        if not hasattr(_tls, "slides"):
-            _tls.slides = {}
-        if not hasattr(_tls, "dzgens"):
-            _tls.dzgens = {}
-
-        mock_handle = MagicMock()
-        _tls.slides[filepath] = mock_handle
-        _tls.dzgens[filepath] = MagicMock()
-
-        get_slide_service.cache_clear()
-        invalidate_slide_service(filepath)
-
-        assert filepath not in _tls.slides
-        assert filepath not in _tls.dzgens
-        mock_handle.close.assert_called_once()
-
-    def test_invalidate_no_tls_slides(self, tmp_path):
-        """invalidate_slide_service when _tls has no slides attr."""
-        filepath = str(tmp_path / "test.svs")
-        if hasattr(_tls, "slides"):
-            del _tls.slides
-        if hasattr(_tls, "dzgens"):
-            del _tls.dzgens
-
-        get_slide_service.cache_clear()
-        invalidate_slide_service(filepath)  # Should not raise
 
-    def test_invalidate_handle_not_in_dict(self, tmp_path):
-        """invalidate_slide_service when _tls.slides exists but path isn't in it."""
-        filepath = str(tmp_path / "nonexistent.svs")
-        if not hasattr(_tls, "slides"):
-            _tls.slides = {}
-        if not hasattr(_tls, "dzgens"):
-            _tls.dzgens = {}
-        # Don't add filepath → pop returns None → handle is None branch
+    @pytest.mark.parametrize("slides,dzgens", [
+        pytest.param("entry", "entry", id="closes-tls-handles"),
+        pytest.param("absent", "absent", id="no-tls-state"),
+        # Dicts exist but hold no entry for the path → pop returns None
+        pytest.param("empty", "empty", id="handle-not-in-dict"),
+        pytest.param("absent", "entry", id="only-dzgens-no-slides"),
+    ])
+    def test_invalidate_tls_states(self, slides, dzgens):
+        """invalidate_slide_service drops this path's TLS entries, whatever the state."""
+        filepath = str(_FAKE_SLIDE)
+        entries = {}
+        for name, state in (("slides", slides), ("dzgens", dzgens)):
+            if state == "empty":
+                setattr(_tls, name, {})
+            elif state == "entry":
+                entries[name] = MagicMock()
+                setattr(_tls, name, {filepath: entries[name]})
 
-        get_slide_service.cache_clear()
         invalidate_slide_service(filepath)  # Should not raise
 
-    def test_invalidate_only_dzgens_no_slides(self, tmp_path):
-        """invalidate_slide_service when _tls has dzgens but no slides."""
-        filepath = str(tmp_path / "test2.svs")
-        if hasattr(_tls, "slides"):
-            del _tls.slides
-        if not hasattr(_tls, "dzgens"):
-            _tls.dzgens = {}
-        _tls.dzgens[filepath] = MagicMock()
-
-        get_slide_service.cache_clear()
-        invalidate_slide_service(filepath)
-        assert filepath not in _tls.dzgens
+        assert filepath not in getattr(_tls, "slides", {})
+        assert filepath not in getattr(_tls, "dzgens", {})
+        if "slides" in entries:
+            entries["slides"].close.assert_called_once()
@@ -15,16 +15,26 @@ from app.spatial.transform import ViewportBounds
 SLIDE_ID = uuid.UUID("aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee")
 
 
-class TestSpatialQueryService:
-    """Tests with a mocked AsyncSession."""
+@pytest.fixture(scope="module")
+def _session() -> AsyncMock:
+    """One AsyncMock session for the module; ``mock_session`` resets it."""
+    return AsyncMock()
+
+
+@pytest.fixture()
+def mock_session(_session) -> AsyncMock:
+    _session.reset_mock(return_value=True, side_effect=True)
+    return _session
 
-    @pytest.fixture()
-    def mock_session(self):
-        return AsyncMock()
 
-    @pytest.fixture()
-    def svc(self, mock_session):
-        return SpatialQueryService(mock_session)
+@pytest.fixture(scope="module")
+def svc(_session) -> SpatialQueryService:
+    """The service only holds the session, so it is shared too."""
+    return SpatialQueryService(_session)
+
+
+class TestSpatialQueryService:
+    """Tests with a mocked AsyncSession."""
 
     # ── get_nuclei_in_viewport ────────────────────────────────
 
@@ -5,6 +5,7 @@ from __future__ import annotations
 
 import math
 
+import numpy as np
 import pytest
 from shapely.geometry import Polygon
 
@@ -54,13 +55,13 @@ class TestViewportBounds:
         assert "POLYGON" in wkt
 
     @pytest.mark.parametrize("x,y,inside", [
-        (50, 50, True),       # Interior
-        (0, 0, True),         # Corner
-        (100, 200, True),     # Opposite corner
-        (-1, 50, False),      # Outside left
-        (101, 50, False),     # Outside right
-        (50, -1, False),      # Outside top
-        (50, 201, False),     # Outside bottom
+        pytest.param(50, 50, True, id="interior"),
+        pytest.param(0, 0, True, id="corner"),
+        pytest.param(100, 200, True, id="opposite-corner"),
+        pytest.param(-1, 50, False, id="outside-left"),
+        pytest.param(101, 50, False, id="outside-right"),
+        pytest.param(50, -1, False, id="outside-top"),
+        pytest.param(50, 201, False, id="outside-bottom"),
     ])
     def test_contains_point(self, x, y, inside):
         b = ViewportBounds(x_min=0, y_min=0, x_max=100, y_max=200)
@@ -75,24 +76,22 @@ class TestViewportBounds:
 # ═══════════════════════════════════════════════════════════════════
 # CoordinateTransformer
 # ═══════════════════════════════════════════════════════════════════
+@pytest.fixture(scope="class")
+def tx() -> CoordinateTransformer:
+    """Shared per class — CoordinateTransformer is never mutated by the tests."""
+    return CoordinateTransformer(mpp=0.25, level_0_width=10000, level_0_height=8000)
+
+
 class TestCoordinateTransformer:
     """Tests for coordinate conversion logic."""
 
-    @pytest.fixture()
-    def tx(self) -> CoordinateTransformer:
-        return CoordinateTransformer(mpp=0.25, level_0_width=10000, level_0_height=8000)
-
     # ── downsample_factor ─────────────────────────────────────
 
-    @pytest.mark.parametrize("level,expected", [
-        (0, 1),
-        (1, 2),
-        (2, 4),
-        (3, 8),
-        (10, 1024),
-    ])
-    def test_downsample_factor(self, level, expected):
-        assert CoordinateTransformer.downsample_factor(level) == expected
+    def test_downsample_factor(self):
+        levels = np.array([0, 1, 2, 3, 10])
+        expected = np.array([1, 2, 4, 8, 1024])
+        actual = np.array([CoordinateTransformer.downsample_factor(int(lv)) for lv in levels])
+        np.testing.assert_array_equal(actual, expected)
 
     # ── viewport_to_level0 ────────────────────────────────────
 